@@ -0,0 +1,232 @@
+"""
+Single-scan aggregation for multi-chart dashboards.
+A list of chart specs is planned first so shared work is done once: each key
+column is factorized once, each (key, value column) statistic is one
+np.bincount over the category codes, and all quartile cut points come from a
+single quantile call. Cost scales with distinct keys and columns, not with
+charts x rows. Lazy frames compute the same totals batch by batch in a single
+pass over the file and fold them, so both produce identical charts.
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List
+from chart_payload import ChartPayload, format_interval_labels, format_numbers
+
+CHART_TYPES = ("bar", "pie", "histogram")
+
+def cut_edges(low: float, high: float, bins: int) -> np.ndarray:
+    """Bin edges identical to pd.cut(values, bins): the range is widened by 0.1%."""
+    if low == high:
+        return np.linspace(low - 0.001 * abs(low or 1), high + 0.001 * abs(high or 1), bins + 1)
+    edges = np.linspace(low, high, bins + 1)
+    edges[0] -= (high - low) * 0.001
+    return edges
+
+def cut_counts(values: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """Counts per right-closed bin, as pd.cut assigns them; NaN is dropped."""
+    bins = len(edges) - 1
+    # NaN sorts past the last edge and lands in the dropped overflow bin
+    index = np.searchsorted(edges, values, side="left") - 1
+    return np.bincount(index, minlength=bins + 1)[:bins]
+
+def quartile_labels(cuts) -> List[str]:
+    f1, f2, f3 = format_numbers(cuts)
+    return [f"< {f1}", f"{f1} - {f2}", f"{f2} - {f3}", f">= {f3}"]
+
+def quartile_counts(values: np.ndarray, cuts) -> np.ndarray:
+    """Counts per quartile bin: [min, q1), [q1, q2), [q2, q3), [q3, max]; NaN is dropped."""
+    index = np.where(np.isnan(values), 4, np.searchsorted(cuts, values, side="right"))
+    return np.bincount(index, minlength=5)[:4]
+
+def _normalize(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """Fill in spec defaults, matching create_enhanced_chart's charts."""
+    spec = dict(spec)
+    chart_type, column = spec.get("type"), spec.get("column")
+    if chart_type not in CHART_TYPES or not column:
+        raise ValueError(f"Each spec needs a type in {CHART_TYPES} and a column: {spec}")
+    group_by = spec.get("group_by")
+    if chart_type == "histogram":
+        spec.setdefault("bins", 10)
+    elif group_by:
+        spec.setdefault("agg", "sum")
+        if spec["agg"] not in ("sum", "mean", "count"):
+            raise ValueError(f"Unsupported aggregation '{spec['agg']}'; use sum, mean or count")
+    spec.setdefault("top", 10 if chart_type == "bar" else 8)
+    return spec
+
+def _stat_key(spec: Dict[str, Any]):
+    """The (key column, value column, statistic) a bar or pie chart needs."""
+    if spec.get("group_by"):
+        return spec["group_by"], spec["column"], spec["agg"]
+    # Value counts: group the column by itself and count rows
+    return spec["column"], None, "rows"
+
+def _plan(specs: List[Dict[str, Any]]):
+    """The distinct pieces of work every chart draws on."""
+    specs = [_normalize(spec) for spec in specs]
+    stats = {_stat_key(spec) for spec in specs if spec["type"] != "histogram"}
+    histograms = {(spec["column"], spec["bins"]) for spec in specs if spec["type"] == "histogram"}
+    return specs, stats, histograms
+
+def _arrays(df: pd.DataFrame, stats, histograms):
+    """One float view per numeric column and one presence mask per value column."""
+    value_columns = {column for _, column, _ in stats if column} | {column for column, _ in histograms}
+    # Counts work on any column; only sums, means and bins need numbers
+    numeric_columns = {column for _, column, stat in stats if stat in ("sum", "mean")} | {column for column, _ in histograms}
+    values = {column: df[column].to_numpy(dtype=np.float64, na_value=np.nan) for column in numeric_columns}
+    present = {column: df[column].notna().to_numpy() for column in value_columns}
+    return values, present
+
+def _group_totals(df: pd.DataFrame, stats, values, present) -> Dict:
+    """Per-group counts (and sums, for sum and mean) of every statistic, with
+    one factorization per key and one np.bincount per (key, value column)."""
+    factorized = {}
+    for key in {key for key, _, _ in stats}:
+        codes, uniques = pd.factorize(df[key], sort=True)
+        # Shift so missing keys (-1) land in bucket 0, which is dropped
+        factorized[key] = (codes + 1, uniques)
+    totals = {}
+    for key, column, stat in stats:
+        codes, uniques = factorized[key]
+        size = len(uniques) + 1
+        if stat == "rows":
+            columns = {"count": np.bincount(codes, minlength=size)[1:]}
+        else:
+            columns = {"count": np.bincount(codes, weights=present[column], minlength=size)[1:]}
+            if stat != "count":
+                columns["sum"] = np.bincount(codes, weights=np.where(present[column], values[column], 0.0), minlength=size)[1:]
+        totals[key, column, stat] = pd.DataFrame(columns, index=uniques)
+    return totals
+
+def _finish(stats, totals: Dict) -> Dict:
+    """Turn per-group totals into the Series each statistic is charted from."""
+    results = {}
+    for key, column, stat in stats:
+        frame = totals.get((key, column, stat), pd.DataFrame({"count": [], "sum": []}))
+        counts = frame["count"].astype(np.int64)
+        if stat in ("rows", "count"):
+            result = counts
+        elif stat == "sum":
+            result = frame["sum"]
+        else:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                result = frame["sum"] / counts
+        # Ties keep key order, as with the sorted factorization
+        results[key, column, stat] = result.rename(None).sort_index()
+    return results
+
+def aggregate_charts(df: pd.DataFrame, specs: List[Dict[str, Any]]) -> List[ChartPayload]:
+    """Compute every chart in specs with shared scans of the frame.
+
+    Spec fields:
+        type: bar, pie or histogram
+        column: Column to aggregate (or to count, for bar/pie without group_by)
+        group_by: Key column for bar/pie (optional)
+        agg: sum, mean or count per group (default sum)
+        bins: Number of equal-width bins, or "quartiles" (histogram, default 10)
+        top: Number of categories to keep (bar 10, pie 8)
+        title, x_label, y_label: Overrides for the generated labels
+        meta: Extra fields copied onto the chart
+    """
+    specs, stats, histograms = _plan(specs)
+    quartile_columns = sorted({column for column, bins in histograms if bins == "quartiles"})
+
+    # Execute: shared arrays, then every statistic and histogram from them
+    values, present = _arrays(df, stats, histograms)
+    results = _finish(stats, _group_totals(df, stats, values, present))
+    quartiles = df[quartile_columns].quantile([0.25, 0.5, 0.75]) if quartile_columns else None
+    for column, bins in histograms:
+        array = values[column]
+        if bins == "quartiles":
+            cuts = quartiles[column].to_numpy()
+            results[column, bins] = quartile_labels(cuts), quartile_counts(array, cuts)
+            continue
+        if not present[column].any():
+            edges = cut_edges(0.0, 1.0, bins)
+        else:
+            edges = cut_edges(np.nanmin(array), np.nanmax(array), bins)
+        results[column, bins] = format_interval_labels(edges), cut_counts(array, edges)
+    return _assemble(specs, results)
+
+def aggregate_lazy_charts(lazy, specs: List[Dict[str, Any]]) -> List[ChartPayload]:
+    """aggregate_charts for a LazyFrame, in one pass over the file.
+
+    Every batch gets the same per-group totals as an in-memory frame, folded
+    into running totals, so memory stays bounded by the groups. Only the
+    histogram ranges need a pass of their own, over the histogram columns.
+    Quartile bins need exact quantiles of the whole column and are not
+    available for lazy frames.
+    """
+    specs, stats, histograms = _plan(specs)
+    for column, bins in histograms:
+        if bins == "quartiles":
+            raise ValueError(f"Quartile bins are not supported for lazy dataframes; give a number of bins for '{column}'")
+
+    # Pre-pass: the range of every histogram column, for the bin edges
+    histogram_columns = sorted({column for column, _ in histograms})
+    bounds = {column: (np.inf, -np.inf) for column in histogram_columns}
+    if histogram_columns:
+        for batch in lazy.batches(histogram_columns):
+            frame = batch.to_pandas()
+            for column in histogram_columns:
+                array = frame[column].to_numpy(dtype=np.float64, na_value=np.nan)
+                if not np.isnan(array).all():
+                    low, high = bounds[column]
+                    bounds[column] = min(low, np.nanmin(array)), max(high, np.nanmax(array))
+    edges = {}
+    for column, bins in histograms:
+        low, high = bounds[column]
+        edges[column, bins] = cut_edges(0.0, 1.0, bins) if low > high else cut_edges(low, high, bins)
+
+    # One pass: fold each batch's totals and bin counts into the running ones
+    columns = sorted({key for key, _, _ in stats} | {column for _, column, _ in stats if column} | set(histogram_columns))
+    totals = {}
+    counts = {histogram: np.zeros(len(bin_edges) - 1, dtype=np.int64) for histogram, bin_edges in edges.items()}
+    for batch in lazy.batches(columns):
+        frame = batch.to_pandas()
+        values, present = _arrays(frame, stats, histograms)
+        for stat, partial in _group_totals(frame, stats, values, present).items():
+            totals[stat] = partial if stat not in totals else totals[stat].add(partial, fill_value=0)
+        for (column, bins), bin_edges in edges.items():
+            counts[column, bins] += cut_counts(values[column], bin_edges)
+    results = _finish(stats, totals)
+    for histogram, bin_edges in edges.items():
+        results[histogram] = format_interval_labels(bin_edges), counts[histogram]
+    return _assemble(specs, results)
+
+def _assemble(specs: List[Dict[str, Any]], results: Dict) -> List[ChartPayload]:
+    """Build each chart from the shared results."""
+    charts = []
+    for spec in specs:
+        column, group_by = spec["column"], spec.get("group_by")
+        labels = {key: spec[key] for key in ("title", "x_label", "y_label") if key in spec}
+        if spec["type"] == "histogram":
+            bin_labels, counts = results[column, spec["bins"]]
+            chart = ChartPayload.labeled(
+                "bar", bin_labels, counts,
+                **{"title": f"Distribution of {column}", "x_label": column, "y_label": "Frequency", **labels},
+            )
+        else:
+            key, value_column, stat = _stat_key(spec)
+            series = results[key, value_column, stat]
+            if not group_by:
+                series = series.sort_values(ascending=False, kind="stable")
+                defaults = {"title": f"{column} Distribution", "x_label": column, "y_label": "Count"}
+            elif spec["type"] == "bar":
+                series = series.sort_values(ascending=False, kind="stable")
+                y_label = {"sum": f"Total {column}", "mean": f"Average {column}", "count": f"Count of {column}"}[stat]
+                defaults = {"title": f"{column} by {group_by}", "x_label": group_by, "y_label": y_label}
+            else:
+                if stat != "mean":
+                    # Share of the total over all groups, as a percentage
+                    series = (series / series.sum() * 100).round(1)
+                defaults = {"title": f"{column} Distribution by {group_by}"}
+            if spec["type"] == "pie":
+                defaults.pop("x_label", None)
+                defaults.pop("y_label", None)
+            chart = ChartPayload.from_series(spec["type"], series.head(spec["top"]), **{**defaults, **labels})
+        for name, value in spec.get("meta", {}).items():
+            chart[name] = value
+        charts.append(chart)
+    return charts
@@ -0,0 +1,126 @@
+"""
+Columnar chart payloads shared by the chart generators.
+A chart's series are held as typed numpy arrays rather than lists of per-point
+dicts; labels are formatted a whole array at a time and the records are written
+to JSON directly from the arrays by pandas' C serializer.
+"""
+
+import re
+import json
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, Optional
+
+def format_numbers(values, decimals: int = 0) -> np.ndarray:
+    """Format numbers like f"{v:.{decimals}f}" for a whole array at once."""
+    values = np.asarray(values, dtype=np.float64)
+    if decimals == 0 and (np.abs(values) < 2**53).all():
+        # Round half to even, as str.format does; avoid the per-element path
+        rounded = np.round(values)
+        labels = rounded.astype(np.int64).astype(str)
+        negative_zero = (rounded == 0) & np.signbit(values)
+        return np.where(negative_zero, "-0", labels)
+    return np.char.mod(f"%.{decimals}f", values)
+
+def format_interval_labels(edges, decimals: int = 0) -> np.ndarray:
+    """Labels like "10-20" for consecutive pairs of bin edges."""
+    formatted = format_numbers(edges, decimals)
+    return np.char.add(np.char.add(formatted[:-1], "-"), formatted[1:])
+
+def json_floats(values) -> np.ndarray:
+    """Shortest round-trip text of each float, as json.dumps writes it; NaN and inf become null."""
+    values = np.asarray(values)
+    return np.where(np.isfinite(values), values.astype(str), "null")
+
+def to_labels(values) -> np.ndarray:
+    """Stringify category values, as str(category) would, in one call."""
+    return np.asarray(values, dtype=object).astype(str)
+
+class ChartPayload:
+    """A chart whose data points are stored column-wise as numpy arrays.
+
+    Metadata (type, title, axis labels, styling...) is accessed like a dict;
+    the per-point fields live in `columns` and are only turned into JSON
+    records on serialization.
+    """
+
+    def __init__(self, meta: Dict[str, Any], columns: Dict[str, Any]):
+        self.meta = dict(meta)
+        self.columns = {name: np.asarray(values) for name, values in columns.items()}
+
+    @classmethod
+    def labeled(cls, chart_type: str, labels, values, **meta) -> "ChartPayload":
+        """A chart of {"label", "value"} points (bar, pie)."""
+        return cls({"type": chart_type, **meta}, {"label": to_labels(labels), "value": values})
+
+    @classmethod
+    def from_series(cls, chart_type: str, series: pd.Series, **meta) -> "ChartPayload":
+        """A labeled chart from a Series' index and values."""
+        return cls.labeled(chart_type, series.index, series.to_numpy(), **meta)
+
+    @classmethod
+    def xy(cls, chart_type: str, x, y, **meta) -> "ChartPayload":
+        """A chart of {"x", "y"} points (line, scatter, area)."""
+        return cls({"type": chart_type, **meta}, {"x": x, "y": y})
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()), ()))
+
+    def __getitem__(self, key):
+        return self.meta[key]
+
+    def __setitem__(self, key, value):
+        self.meta[key] = value
+
+    def __contains__(self, key):
+        return key in self.meta
+
+    def head(self, n: int) -> "ChartPayload":
+        return ChartPayload(self.meta, {name: values[:n] for name, values in self.columns.items()})
+
+    def records_json(self) -> str:
+        """The data points as a JSON array of records, written from the arrays.
+
+        to_json rounds floats to at most 15 digits, so float columns are
+        written as their shortest round-trip text and unquoted afterwards.
+        """
+        if not len(self):
+            return "[]"
+        floats = [name for name, values in self.columns.items() if values.dtype.kind == "f"]
+        columns = {name: json_floats(values) if name in floats else values for name, values in self.columns.items()}
+        text = pd.DataFrame(columns, copy=False).to_json(orient="records")
+        if not floats:
+            return text
+        # Quotes inside string values are escaped, so [{,]"key":" only matches keys
+        keys = "|".join(re.escape(json.dumps(name)) for name in floats)
+        return re.sub(f'([{{,](?:{keys}):)"([^"]*)"', r"\1\2", text)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain-dict form with a list of point records, for callers that need it."""
+        return {**self.meta, "data": json.loads(self.records_json())}
+
+def _default(obj):
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps(obj, indent: Optional[int] = None) -> str:
+    """json.dumps for structures that contain ChartPayloads.
+
+    Each payload's metadata goes through json.dumps as usual; its records are
+    spliced in from records_json() without building per-point Python dicts.
+    """
+    fragments = []
+
+    def default(value):
+        if isinstance(value, ChartPayload):
+            fragments.append(value.records_json())
+            return {**value.meta, "data": f"\0{len(fragments) - 1}\0"}
+        return _default(value)
+
+    text = json.dumps(obj, indent=indent, default=default)
+    for index, fragment in enumerate(fragments):
+        text = text.replace(f'"\\u0000{index}\\u0000"', fragment, 1)
+    return text
@@ -4,14 +4,22 @@ This is an improved version of your create_simple_chart tool.
 """
 
 import json
+import numpy as np
 import pandas as pd
 from typing import List, Dict, Any
 from mcp import types
 from mcp.types import TextContent
+from mcp.server.fastmcp import Context
+from chart_payload import ChartPayload, dumps, format_interval_labels
+from time_buckets import resample_time
+from scatter_density import SCATTER_DENSITY_THRESHOLD, density_chart, density_grid
+from batch_aggregate import aggregate_charts, aggregate_lazy_charts
 
 @mcp.tool()
 def create_enhanced_chart(df_name: str, chart_type: str, column: str = None, 
-                         group_by: str = None, title: str = None) -> List[TextContent]:
+                         group_by: str = None, title: str = None,
+                         value_column: str = None, agg: str = "count",
+                         ctx: Context = None) -> List[TextContent]:
     """
     Create enhanced chart data optimized for the SmartChart frontend component.
     
@@ -21,142 +29,141 @@ def create_enhanced_chart(df_name: str, chart_type: str, column: str = None,
         column: Column to visualize (required for most chart types)
         group_by: Column to group by (for bar/pie charts)
         title: Custom title for the chart
+        value_column: Column to aggregate per time bucket (for datetime line charts)
+        agg: Aggregation per time bucket: count, sum or mean (for datetime line charts)
     """
-    global _dataframes
+    session = _session(ctx)
     
-    if df_name not in _dataframes:
+    if not session.known(df_name):
         return [TextContent(type="text", text=f"DataFrame '{df_name}' not found")]
     
-    df = _dataframes[df_name]
+    df = _get_dataframe(session, df_name)
+    lazy = isinstance(df, LazyFrame)
     
     try:
         chart_data = None
         
+        if lazy and (chart_type == "line" or chart_type == "scatter" and len(df) <= SCATTER_DENSITY_THRESHOLD):
+            # No streaming form for these yet; load only the plotted columns
+            df = df.to_pandas(columns=[col for col in (column, group_by, value_column) if col])
+        
         if chart_type == "histogram" and column:
             # Create histogram data
-            values = df[column].dropna()
-            hist, bins = pd.cut(values, bins=10, retbins=True)
-            counts = hist.value_counts().sort_index()
+            if lazy:
+                counts, bins = df.histogram(column, bins=10)
+            else:
+                values = df[column].dropna()
+                codes, bins = pd.cut(values, bins=10, retbins=True, labels=False)
+                counts = np.bincount(codes, minlength=10)
             
-            chart_data = {
-                "type": "bar",
-                "title": title or f"Distribution of {column}",
-                "x_label": column,
-                "y_label": "Frequency",
-                "data": [
-                    {"label": f"{interval.left:.0f}-{interval.right:.0f}", "value": count}
-                    for interval, count in counts.items()
-                ]
-            }
+            chart_data = ChartPayload.labeled(
+                "bar", format_interval_labels(bins), counts,
+                title=title or f"Distribution of {column}",
+                x_label=column,
+                y_label="Frequency",
+            )
             
         elif chart_type == "line" and column:
             # Create line chart data
             if pd.api.types.is_datetime64_any_dtype(df[column]):
-                # Time series data
-                df_sorted = df.sort_values(column)
-                chart_data = {
-                    "type": "line",
-                    "title": title or f"{column} Over Time",
-                    "x_label": "Date",
-                    "y_label": column,
-                    "data": [
-                        {"x": row[column].strftime('%Y-%m-%d'), "y": idx}
-                        for idx, (_, row) in enumerate(df_sorted.iterrows())
-                    ]
-                }
+                # Time series data, bucketed at a granularity that fits the point budget
+                values = df[value_column] if value_column else None
+                labels, totals, granularity = resample_time(df[column], values, agg)
+                chart_data = ChartPayload.xy(
+                    "line", labels, totals,
+                    title=title or f"{column} Over Time",
+                    x_label=f"Date ({granularity})",
+                    y_label="Count" if agg == "count" else f"{agg.title()} of {value_column}",
+                )
             else:
                 # Regular line chart
-                chart_data = {
-                    "type": "line",
-                    "title": title or f"{column} Trend",
-                    "x_label": "Index",
-                    "y_label": column,
-                    "data": [
-                        {"x": idx, "y": value}
-                        for idx, value in enumerate(df[column].dropna().tolist())
-                    ]
-                }
+                values = df[column].dropna().to_numpy()
+                chart_data = ChartPayload.xy(
+                    "line", np.arange(len(values)), values,
+                    title=title or f"{column} Trend",
+                    x_label="Index",
+                    y_label=column,
+                )
                 
         elif chart_type == "bar" and column:
             if group_by:
                 # Grouped bar chart
-                grouped = df.groupby(group_by)[column].sum().sort_values(ascending=False)
-                chart_data = {
-                    "type": "bar",
-                    "title": title or f"{column} by {group_by}",
-                    "x_label": group_by,
-                    "y_label": f"Total {column}",
-                    "data": [
-                        {"label": str(category), "value": float(value)}
-                        for category, value in grouped.head(10).items()
-                    ]
-                }
+                grouped = df.groupby_sum(group_by, column) if lazy else df.groupby(group_by)[column].sum()
+                grouped = grouped.sort_values(ascending=False)
+                chart_data = ChartPayload.from_series(
+                    "bar", grouped.head(10).astype(float),
+                    title=title or f"{column} by {group_by}",
+                    x_label=group_by,
+                    y_label=f"Total {column}",
+                )
             else:
                 # Value counts
-                counts = df[column].value_counts().head(10)
-                chart_data = {
-                    "type": "bar",
-                    "title": title or f"{column} Distribution",
-                    "x_label": column,
-                    "y_label": "Count",
-                    "data": [
-                        {"label": str(category), "value": count}
-                        for category, count in counts.items()
-                    ]
-                }
+                counts = (df.value_counts(column) if lazy else df[column].value_counts()).head(10)
+                chart_data = ChartPayload.from_series(
+                    "bar", counts,
+                    title=title or f"{column} Distribution",
+                    x_label=column,
+                    y_label="Count",
+                )
                 
         elif chart_type == "pie" and column:
             if group_by:
                 # Pie chart by group
-                grouped = df.groupby(group_by)[column].sum()
+                grouped = df.groupby_sum(group_by, column) if lazy else df.groupby(group_by)[column].sum()
                 total = grouped.sum()
-                chart_data = {
-                    "type": "pie",
-                    "title": title or f"{column} Distribution by {group_by}",
-                    "data": [
-                        {"label": str(category), "value": round((value/total)*100, 1)}
-                        for category, value in grouped.head(8).items()
-                    ]
-                }
+                top = grouped.head(8)
+                chart_data = ChartPayload.labeled(
+                    "pie", top.index, np.round(top.to_numpy() / total * 100, 1),
+                    title=title or f"{column} Distribution by {group_by}",
+                )
             else:
                 # Value counts as pie
-                counts = df[column].value_counts().head(8)
-                chart_data = {
-                    "type": "pie",
-                    "title": title or f"{column} Distribution",
-                    "data": [
-                        {"label": str(category), "value": count}
-                        for category, count in counts.items()
-                    ]
-                }
+                counts = (df.value_counts(column) if lazy else df[column].value_counts()).head(8)
+                chart_data = ChartPayload.from_series(
+                    "pie", counts,
+                    title=title or f"{column} Distribution",
+                )
                 
         elif chart_type == "scatter" and column and group_by:
-            # Scatter plot between two columns
-            sample_df = df[[column, group_by]].dropna().sample(min(100, len(df)))
-            chart_data = {
-                "type": "scatter",
-                "title": title or f"{column} vs {group_by}",
-                "x_label": column,
-                "y_label": group_by,
-                "data": [
-                    {"x": float(row[column]), "y": float(row[group_by])}
-                    for _, row in sample_df.iterrows()
-                ]
-            }
+            if len(df) > SCATTER_DENSITY_THRESHOLD:
+                # Too many rows to sample faithfully; bin every point into a density grid
+                if lazy:
+                    counts, x_edges, y_edges = df.density(column, group_by)
+                else:
+                    counts, x_edges, y_edges = density_grid(df[column], df[group_by])
+                chart_data = density_chart(
+                    counts, x_edges, y_edges,
+                    title=title or f"{column} vs {group_by} (point density)",
+                    x_label=column,
+                    y_label=group_by,
+                )
+            else:
+                # Scatter plot between two columns
+                sample_df = df[[column, group_by]].dropna()
+                sample_df = sample_df.sample(min(100, len(sample_df)))
+                chart_data = ChartPayload.xy(
+                    "scatter",
+                    sample_df[column].to_numpy(dtype=float),
+                    sample_df[group_by].to_numpy(dtype=float),
+                    title=title or f"{column} vs {group_by}",
+                    x_label=column,
+                    y_label=group_by,
+                )
         else:
-            return [TextContent(type="text", text="""
+            return [TextContent(type="text", text=f"""
 Supported chart types:
 - histogram: column (required)
-- line: column (required)
+- line: column (required); for datetime columns, value_column and agg (count, sum, mean) optional
 - bar: column (required), group_by (optional)
 - pie: column (required), group_by (optional)
-- scatter: column and group_by (both required)
+- scatter: column and group_by (both required); a density heatmap above {SCATTER_DENSITY_THRESHOLD} rows
 
 Examples:
 - create_enhanced_chart('df_1', 'histogram', 'SALES')
 - create_enhanced_chart('df_1', 'bar', 'SALES', 'COUNTRY')
 - create_enhanced_chart('df_1', 'pie', 'QUANTITYORDERED', 'PRODUCTLINE')
 - create_enhanced_chart('df_1', 'scatter', 'SALES', 'QUANTITYORDERED')
+- create_enhanced_chart('df_1', 'line', 'ORDERDATE', value_column='SALES', agg='sum')
             """)]
         
         if chart_data:
@@ -164,7 +171,7 @@ Examples:
             response = f"""Chart created successfully!
 
 ```recharts
-{json.dumps(chart_data, indent=2)}
+{dumps(chart_data, indent=2)}
 ```"""
             return [TextContent(type="text", text=response)]
         
@@ -172,7 +179,7 @@ Examples:
         return [TextContent(type="text", text=f"Error creating chart: {str(e)}")]
 
 @mcp.tool()
-def create_dashboard(df_name: str, columns: List[str] = None) -> List[TextContent]:
+def create_dashboard(df_name: str, columns: List[str] = None, ctx: Context = None) -> List[TextContent]:
     """
     Create a multi-chart dashboard for quick data exploration.
     
@@ -180,57 +187,47 @@ def create_dashboard(df_name: str, columns: List[str] = None) -> List[TextConten
         df_name: Name of the DataFrame to analyze
         columns: List of columns to focus on (optional, will auto-select if not provided)
     """
-    global _dataframes
+    session = _session(ctx)
     
-    if df_name not in _dataframes:
+    if not session.known(df_name):
         return [TextContent(type="text", text=f"DataFrame '{df_name}' not found")]
     
-    df = _dataframes[df_name]
+    df = _get_dataframe(session, df_name)
+    lazy = isinstance(df, LazyFrame)
     
     try:
         # Auto-select interesting columns if not provided
         if not columns:
-            numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-            categorical_cols = df.select_dtypes(include=['object']).columns.tolist()
+            if lazy:
+                numeric_cols = [col for col in df.columns if df.is_numeric(col)]
+                categorical_cols = [col for col in df.columns if not df.is_numeric(col) and not df.is_datetime(col)]
+            else:
+                numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
+                categorical_cols = df.select_dtypes(include=['object']).columns.tolist()
             columns = (numeric_cols[:3] + categorical_cols[:2])[:4]  # Max 4 charts
         
-        charts = []
-        
+        specs = []
         for col in columns[:4]:  # Limit to 4 charts
-            if df[col].dtype in ['int64', 'float64']:
+            if df.is_numeric(col) if lazy else df[col].dtype in ['int64', 'float64']:
                 # Numeric column - create histogram
-                values = df[col].dropna()
-                hist, bins = pd.cut(values, bins=8, retbins=True)
-                counts = hist.value_counts().sort_index()
-                
-                charts.append({
-                    "type": "bar",
-                    "title": f"Distribution of {col}",
-                    "x_label": col,
-                    "y_label": "Frequency",
-                    "data": [
-                        {"label": f"{interval.left:.0f}-{interval.right:.0f}", "value": count}
-                        for interval, count in counts.items()
-                    ]
-                })
+                specs.append({"type": "histogram", "column": col, "bins": 8})
             else:
                 # Categorical column - create pie chart
-                counts = df[col].value_counts().head(6)
-                charts.append({
-                    "type": "pie",
-                    "title": f"{col} Distribution",
-                    "data": [
-                        {"label": str(category), "value": count}
-                        for category, count in counts.items()
-                    ]
-                })
+                specs.append({"type": "pie", "column": col, "top": 6})
+        
+        if lazy:
+            # All charts from one streaming pass over the file
+            charts = aggregate_lazy_charts(df, specs)
+        else:
+            # All charts from shared scans of the frame
+            charts = aggregate_charts(df, specs)
         
         dashboard_data = {"plots": charts}
         
         response = f"""Dashboard created for {len(charts)} key columns!
 
 ```recharts
-{json.dumps(dashboard_data, indent=2)}
+{dumps(dashboard_data, indent=2)}
 ```"""
         
         return [TextContent(type="text", text=response)]
@@ -238,6 +235,100 @@ def create_dashboard(df_name: str, columns: List[str] = None) -> List[TextConten
     except Exception as e:
         return [TextContent(type="text", text=f"Error creating dashboard: {str(e)}")]
 
+@mcp.tool()
+def create_charts(df_name: str, specs: List[Dict[str, Any]], ctx: Context = None) -> List[TextContent]:
+    """
+    Create several bar, pie and histogram charts at once, sharing the work between them.
+    
+    Each key column is factorized once and every sum/count/mean over it is a
+    single pass, so asking for a bar, a pie and a histogram costs about the
+    same as asking for one.
+    
+    Args:
+        df_name: Name of the DataFrame to use
+        specs: Chart specs, each with type (bar, pie, histogram) and column, plus
+            optional group_by, agg (sum, mean, count), bins (number or "quartiles"),
+            top, title, x_label and y_label. Quartile bins need an in-memory dataframe.
+    """
+    session = _session(ctx)
+    
+    if not session.known(df_name):
+        return [TextContent(type="text", text=f"DataFrame '{df_name}' not found")]
+    
+    df = _get_dataframe(session, df_name)
+    
+    try:
+        if isinstance(df, LazyFrame):
+            # Each statistic streams over the file once; nothing is loaded whole
+            charts = aggregate_lazy_charts(df, specs)
+        else:
+            charts = aggregate_charts(df, specs)
+        
+        response = f"""Created {len(charts)} charts!
+
+```recharts
+{dumps({"plots": charts}, indent=2)}
+```"""
+        
+        return [TextContent(type="text", text=response)]
+        
+    except Exception as e:
+        return [TextContent(type="text", text=f"Error creating charts: {str(e)}")]
+
+@mcp.tool()
+def create_correlation_heatmap(df_name: str, columns: List[str] = None, method: str = "correlation",
+                               title: str = None, ctx: Context = None) -> List[TextContent]:
+    """
+    Create a correlation or covariance heatmap of numeric columns.
+    
+    The frame's moments are computed once per version and cached, so heatmaps
+    of other column subsets are served without rescanning the data, and rows
+    appended to a saved frame only add their own contribution.
+    
+    Args:
+        df_name: Name of the DataFrame to use
+        columns: Numeric columns to include (optional, defaults to all numeric columns)
+        method: 'correlation' (Pearson) or 'covariance'
+        title: Chart title (optional)
+    """
+    session = _session(ctx)
+    
+    if not session.known(df_name):
+        return [TextContent(type="text", text=f"DataFrame '{df_name}' not found")]
+    
+    if method not in ("correlation", "covariance"):
+        return [TextContent(type="text", text=f"Unsupported method '{method}'; use correlation or covariance")]
+    
+    try:
+        moments = _frame_moments(session, df_name)
+        if method == "correlation":
+            columns, matrix = moments.correlation(columns)
+        else:
+            columns, matrix = moments.covariance(columns)
+        if not columns:
+            return [TextContent(type="text", text=f"DataFrame '{df_name}' has no numeric columns")]
+        
+        # Undefined entries (constant or too sparse columns) become null
+        z = np.where(np.isnan(matrix), None, np.round(matrix, 4))
+        chart = {
+            "type": "heatmap",
+            "title": title or f"{method.capitalize()} of {df_name}",
+            "x": columns,
+            "y": columns,
+            "z": z,
+        }
+        
+        response = f"""Created {method} heatmap of {len(columns)} columns!
+
+```recharts
+{dumps(chart, indent=2)}
+```"""
+        
+        return [TextContent(type="text", text=response)]
+        
+    except Exception as e:
+        return [TextContent(type="text", text=f"Error creating heatmap: {str(e)}")]
+
 # Usage examples for testing:
 """
 # Single charts
@@ -245,8 +336,21 @@ create_enhanced_chart('df_1', 'histogram', 'SALES')
 create_enhanced_chart('df_1', 'bar', 'SALES', 'COUNTRY') 
 create_enhanced_chart('df_1', 'pie', 'QUANTITYORDERED', 'PRODUCTLINE')
 create_enhanced_chart('df_1', 'line', 'ORDERDATE')
+create_enhanced_chart('df_1', 'line', 'ORDERDATE', value_column='SALES', agg='sum')
 create_enhanced_chart('df_1', 'scatter', 'SALES', 'QUANTITYORDERED')
 
 # Dashboard
 create_dashboard('df_1', ['SALES', 'COUNTRY', 'PRODUCTLINE'])
+
+# Several charts over the same grouping in one pass
+create_charts('df_1', [
+    {'type': 'bar', 'column': 'SALES', 'group_by': 'COUNTRY'},
+    {'type': 'pie', 'column': 'SALES', 'group_by': 'COUNTRY'},
+    {'type': 'bar', 'column': 'QUANTITYORDERED', 'group_by': 'COUNTRY', 'agg': 'mean'},
+    {'type': 'histogram', 'column': 'SALES'},
+])
+
+# Correlation heatmaps, served from cached moments
+create_correlation_heatmap('df_1')
+create_correlation_heatmap('df_1', ['SALES', 'QUANTITYORDERED', 'PRICEEACH'], method='covariance')
 """
@@ -8,6 +8,10 @@ import pandas as pd
 import numpy as np
 from mcp import ClientSession, StdioServerParameters
 from mcp.client.stdio import stdio_client
+from mcp.server.fastmcp import Context
+from chart_payload import ChartPayload, dumps, format_interval_labels, to_labels
+from time_buckets import resample_time
+from batch_aggregate import aggregate_charts, quartile_counts, quartile_labels
 from typing import List, Dict, Any
 
 # Smart data sampling and aggregation functions
@@ -44,7 +48,7 @@ def smart_sample_data(df: pd.DataFrame, column: str, max_points: int = 50) -> Li
     # Default: random sampling
     return df[column].sample(n=min(max_points, len(df))).tolist()
 
-def create_enhanced_histogram(df: pd.DataFrame, column: str, title: str = None) -> Dict[str, Any]:
+def create_enhanced_histogram(df: pd.DataFrame, column: str, title: str = None) -> ChartPayload:
     """Create an enhanced histogram with better styling and context efficiency."""
     
     # Smart sampling for large datasets
@@ -53,101 +57,87 @@ def create_enhanced_histogram(df: pd.DataFrame, column: str, title: str = None)
         data = df[column].describe()
         
         # Create histogram bins based on quartiles
-        q1, q2, q3 = data['25%'], data['50%'], data['75%']
-        min_val, max_val = data['min'], data['max']
+        cuts = data[['25%', '50%', '75%']].to_numpy()
+        values = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
         
-        # Create meaningful bins
-        bins = [
-            {'range': f'< {q1:.0f}', 'count': len(df[df[column] < q1])},
-            {'range': f'{q1:.0f} - {q2:.0f}', 'count': len(df[(df[column] >= q1) & (df[column] < q2)])},
-            {'range': f'{q2:.0f} - {q3:.0f}', 'count': len(df[(df[column] >= q2) & (df[column] < q3)])},
-            {'range': f'> {q3:.0f}', 'count': len(df[df[column] > q3])},
-        ]
-        
-        chart_data = [{'label': bin_data['range'], 'value': bin_data['count']} for bin_data in bins]
+        # Create meaningful bins, split the same way as dashboard histograms
+        labels = quartile_labels(cuts)
+        counts = quartile_counts(values, cuts)
     else:
         # For smaller datasets, use actual values
-        hist, bin_edges = np.histogram(df[column], bins=min(10, len(df)//5))
-        chart_data = [
-            {'label': f'{bin_edges[i]:.0f}-{bin_edges[i+1]:.0f}', 'value': int(hist[i])}
-            for i in range(len(hist))
-        ]
-    
-    return {
-        'type': 'bar',
-        'data': chart_data,
-        'title': title or f'Distribution of {column}',
-        'x_label': column,
-        'y_label': 'Frequency',
-        'styling': {
+        counts, bin_edges = np.histogram(df[column], bins=min(10, len(df)//5))
+        labels = format_interval_labels(bin_edges)
+    
+    return ChartPayload.labeled(
+        'bar', labels, counts,
+        title=title or f'Distribution of {column}',
+        x_label=column,
+        y_label='Frequency',
+        styling={
             'color_scheme': 'business' if 'sales' in column.lower() else 'default',
             'show_trend': True,
             'gradient_fill': True
         },
-        'metadata': {
+        metadata={
             'original_size': len(df),
             'chart_type': 'enhanced_histogram',
             'optimization': 'statistical_binning'
         }
-    }
+    )
 
-def create_enhanced_line_chart(df: pd.DataFrame, column: str, title: str = None) -> Dict[str, Any]:
+def create_enhanced_line_chart(df: pd.DataFrame, column: str, title: str = None,
+                               value_column: str = None, agg: str = 'count',
+                               max_points: int = 60) -> ChartPayload:
     """Create an enhanced line chart with trend analysis."""
     
+    granularity = None
     # Smart time-based sampling
     if pd.api.types.is_datetime64_any_dtype(df[column]):
-        # Group by time periods for large datasets
-        if len(df) > 50:
-            df_copy = df.copy()
-            df_copy['period'] = pd.to_datetime(df_copy[column]).dt.to_period('M')
-            grouped = df_copy.groupby('period').size()
-            
-            chart_data = [
-                {'x': i, 'y': count, 'label': str(period)}
-                for i, (period, count) in enumerate(grouped.items())
-            ]
+        # Bucket large datasets at the finest granularity that fits max_points
+        if len(df) > 50 or value_column:
+            values = df[value_column] if value_column else None
+            labels, y, granularity = resample_time(df[column], values, agg, max_points=max_points)
+            x = np.arange(len(labels))
         else:
-            chart_data = [
-                {'x': i, 'y': 1, 'label': str(val)}
-                for i, val in enumerate(df[column])
-            ]
+            x, y, labels = np.arange(len(df)), np.ones(len(df), dtype=np.int64), df[column].astype(str).to_numpy()
     else:
         # For non-date data, use value sampling
         sampled_data = smart_sample_data(df, column, 30)
-        chart_data = [
-            {'x': i, 'y': val if pd.api.types.is_numeric_dtype(df[column]) else i+1, 'label': str(val)}
-            for i, val in enumerate(sampled_data)
-        ]
+        x = np.arange(len(sampled_data))
+        y = np.asarray(sampled_data) if pd.api.types.is_numeric_dtype(df[column]) else x + 1
+        labels = to_labels(sampled_data)
     
     # Add trend analysis
-    if len(chart_data) > 3 and all(isinstance(point['y'], (int, float)) for point in chart_data):
-        y_values = [point['y'] for point in chart_data]
-        trend = 'increasing' if y_values[-1] > y_values[0] else 'decreasing'
+    if len(y) > 3 and np.issubdtype(y.dtype, np.number):
+        trend = 'increasing' if y[-1] > y[0] else 'decreasing'
     else:
         trend = 'stable'
     
-    return {
-        'type': 'line',
-        'data': chart_data,
-        'title': title or f'{column} Trend Analysis',
-        'x_label': 'Time Period' if pd.api.types.is_datetime64_any_dtype(df[column]) else 'Index',
-        'y_label': column,
-        'styling': {
-            'color_scheme': 'professional',
-            'show_trend_line': True,
-            'gradient_area': True,
-            'smooth_curves': True
-        },
-        'insights': {
-            'trend': trend,
-            'data_points': len(chart_data),
-            'time_range': f"{chart_data[0]['label']} to {chart_data[-1]['label']}" if chart_data else None
+    return ChartPayload(
+        {
+            'type': 'line',
+            'title': title or f'{column} Trend Analysis',
+            'x_label': 'Time Period' if pd.api.types.is_datetime64_any_dtype(df[column]) else 'Index',
+            'y_label': f'{agg.title()} of {value_column}' if value_column else column,
+            'styling': {
+                'color_scheme': 'professional',
+                'show_trend_line': True,
+                'gradient_area': True,
+                'smooth_curves': True
+            },
+            'insights': {
+                'trend': trend,
+                'data_points': len(x),
+                'time_range': f"{labels[0]} to {labels[-1]}" if len(labels) else None
+            },
+            'metadata': {
+                'original_size': len(df),
+                'sampling_method': 'time_based' if pd.api.types.is_datetime64_any_dtype(df[column]) else 'smart_sample',
+                'granularity': granularity
+            }
         },
-        'metadata': {
-            'original_size': len(df),
-            'sampling_method': 'time_based' if pd.api.types.is_datetime64_any_dtype(df[column]) else 'smart_sample'
-        }
-    }
+        {'x': x, 'y': y, 'label': labels},
+    )
 
 def create_smart_dashboard(df: pd.DataFrame, columns: List[str]) -> Dict[str, Any]:
     """Create a multi-chart dashboard with minimal context usage."""
@@ -159,10 +149,38 @@ def create_smart_dashboard(df: pd.DataFrame, columns: List[str]) -> Dict[str, An
         'charts': []
     }
     
-    for i, column in enumerate(columns[:4]):  # Limit to 4 charts to save context
-        if pd.api.types.is_numeric_dtype(df[column]):
+    columns = columns[:4]  # Limit to 4 charts to save context
+    numeric = [column for column in columns if pd.api.types.is_numeric_dtype(df[column])]
+    if len(df) > 100:
+        # Quartile histograms for all numeric columns from shared scans
+        histograms = aggregate_charts(df, [
+            {
+                'type': 'histogram',
+                'column': column,
+                'bins': 'quartiles',
+                'meta': {
+                    'styling': {
+                        'color_scheme': 'business' if 'sales' in column.lower() else 'default',
+                        'show_trend': True,
+                        'gradient_fill': True
+                    },
+                    'metadata': {
+                        'original_size': len(df),
+                        'chart_type': 'enhanced_histogram',
+                        'optimization': 'statistical_binning'
+                    }
+                }
+            }
+            for column in numeric
+        ])
+    else:
+        histograms = [create_enhanced_histogram(df, column) for column in numeric]
+    histograms = dict(zip(numeric, histograms))
+    
+    for i, column in enumerate(columns):
+        if column in histograms:
             # Create compact histogram
-            chart = create_enhanced_histogram(df, column)
+            chart = histograms[column]
             chart['position'] = {'row': i//2, 'col': i%2}
             chart['size'] = 'compact'
             dashboard_config['charts'].append(chart)
@@ -180,16 +198,21 @@ def create_smart_dashboard(df: pd.DataFrame, columns: List[str]) -> Dict[str, An
 
 @mcp.tool()
 def create_optimized_chart(df_name: str, chart_type: str, column: str, 
-                          max_context: int = 1000) -> List[Any]:
+                          max_context: int = 1000, ctx: Context = None) -> List[Any]:
     """Create enhanced charts optimized for context efficiency."""
     
-    global _dataframes
-    if df_name not in _dataframes:
+    session = _session(ctx)
+    if not session.known(df_name):
         return [TextContent(type="text", text=f"DataFrame '{df_name}' not found")]
     
-    df = _dataframes[df_name]
+    df = _get_dataframe(session, df_name)
     
     try:
+        if isinstance(df, LazyFrame):
+            # Load just the columns these charts read rather than the whole file
+            wanted = [column] + [col for col in df.columns if col != column][:3] if chart_type == "smart_dashboard" else [column]
+            df = df.to_pandas(columns=wanted)
+        
         if chart_type == "enhanced_histogram":
             chart_data = create_enhanced_histogram(df, column)
             
@@ -204,13 +227,17 @@ def create_optimized_chart(df_name: str, chart_type: str, column: str,
             return [TextContent(type="text", text="Supported: enhanced_histogram, trend_analysis, smart_dashboard")]
         
         # Ensure response stays under context limit
-        response_text = json.dumps(chart_data, indent=2)
+        response_text = dumps(chart_data, indent=2)
         if len(response_text) > max_context:
             # Fallback to compact format
-            chart_data['data'] = chart_data['data'][:10]  # Limit data points
+            if isinstance(chart_data, ChartPayload):
+                chart_data = chart_data.head(10)  # Limit data points
+            else:
+                chart_data['charts'] = [chart.head(10) for chart in chart_data['charts']]
             chart_data['note'] = f"Data truncated for context efficiency (showing top 10 of {len(df)} records)"
+            response_text = dumps(chart_data, indent=2)
         
-        return [TextContent(type="text", text=json.dumps(chart_data, indent=2))]
+        return [TextContent(type="text", text=response_text)]
     
     except Exception as e:
         return [TextContent(type="text", text=f"Error creating enhanced chart: {str(e)}")]
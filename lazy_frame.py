@@ -0,0 +1,214 @@
+"""
+Out-of-core DataFrame handle for CSV files larger than RAM.
+The CSV is converted once, in streaming fashion, to a Parquet file and queried
+as a pyarrow dataset; aggregations run batch by batch so memory stays bounded
+by the batch size and the number of distinct groups, not by the file size.
+"""
+
+import os
+import re
+import hashlib
+import tempfile
+import numpy as np
+import pandas as pd
+from typing import List, Optional
+from batch_aggregate import cut_counts, cut_edges
+from scatter_density import DENSITY_BINS, density_bounds, density_counts, density_edges, merge_bounds
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Where converted Parquet files are kept; shared by all sessions and restarts
+SPILL_DIR = os.environ.get("MCP_DS_SPILL_DIR") or os.path.join(tempfile.gettempdir(), "mcp_ds_lazy")
+BLOCK_SIZE = 64 * 2**20
+# Bump when the conversion changes so stale spill files are not reused
+_CONVERT_VERSION = 2
+
+_CONVERSION_ERROR = re.compile(r"In CSV column #(\d+): .*CSV conversion error")
+
+def _widened(field_type):
+    """The type to retry a column with when a value does not fit its inferred type."""
+    if pa.types.is_integer(field_type):
+        return pa.float64()
+    return pa.string()
+
+def _convert_csv(csv_path: str, parquet_path: str, encoding: str = "utf8") -> None:
+    """Stream a CSV into a Parquet file.
+
+    pyarrow infers column types from the first block. When a later block holds
+    a value that does not fit (1.5 in an integer column, text in a numeric
+    one), that column is widened and the conversion restarts. Empty fields
+    are read as nulls, as pandas reads them as NaN.
+    """
+    column_types = {}
+    tmp_path = parquet_path + ".tmp"
+    while True:
+        reader = pacsv.open_csv(
+            csv_path,
+            read_options=pacsv.ReadOptions(block_size=BLOCK_SIZE, encoding=encoding),
+            convert_options=pacsv.ConvertOptions(column_types=column_types, strings_can_be_null=True),
+        )
+        try:
+            with pq.ParquetWriter(tmp_path, reader.schema) as writer:
+                for batch in reader:
+                    writer.write_batch(batch)
+        except BaseException as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            match = _CONVERSION_ERROR.search(str(e)) if isinstance(e, pa.ArrowInvalid) else None
+            if match is None:
+                raise
+            field = reader.schema.field(int(match.group(1)))
+            if field.type == _widened(field.type):
+                raise
+            column_types[field.name] = _widened(field.type)
+            continue
+        os.replace(tmp_path, parquet_path)
+        return
+
+def open_lazy_csv(csv_path: str) -> "LazyFrame":
+    """Open a CSV as a LazyFrame, converting it to Parquet on first use."""
+    if pa is None:
+        raise ImportError("Lazy dataframes require pyarrow to be installed")
+    stat = os.stat(csv_path)
+    key = f"{os.path.realpath(csv_path)}|{stat.st_size}|{stat.st_mtime_ns}|{_CONVERT_VERSION}"
+    parquet_path = os.path.join(SPILL_DIR, hashlib.sha1(key.encode("utf-8")).hexdigest() + ".parquet")
+    if not os.path.exists(parquet_path):
+        os.makedirs(SPILL_DIR, exist_ok=True)
+        try:
+            _convert_csv(csv_path, parquet_path)
+        except pa.ArrowInvalid as e:
+            if "UTF8" not in str(e):
+                raise
+            _convert_csv(csv_path, parquet_path, encoding="latin1")
+    return LazyFrame(parquet_path, csv_path)
+
+class LazyFrame:
+    """A read-only, disk-backed table exposing the aggregations the chart tools need."""
+
+    def __init__(self, parquet_path: str, source: Optional[str] = None):
+        self.path = parquet_path
+        self.source = source
+        self.dataset = ds.dataset(parquet_path, format="parquet")
+
+    def __repr__(self):
+        return f"LazyFrame({self.source or self.path!r}, rows={len(self)}, columns={self.columns})"
+
+    def __len__(self):
+        return self.dataset.count_rows()
+
+    @property
+    def columns(self) -> List[str]:
+        return self.dataset.schema.names
+
+    @property
+    def dtypes(self) -> pd.Series:
+        return pd.Series(
+            {field.name: field.type.to_pandas_dtype() for field in self.dataset.schema},
+            dtype=object,
+        )
+
+    def is_numeric(self, column: str) -> bool:
+        field_type = self.dataset.schema.field(column).type
+        return pa.types.is_integer(field_type) or pa.types.is_floating(field_type)
+
+    def is_datetime(self, column: str) -> bool:
+        field_type = self.dataset.schema.field(column).type
+        return pa.types.is_timestamp(field_type) or pa.types.is_date(field_type)
+
+    def batches(self, columns: List[str]):
+        """Stream record batches holding only the given columns."""
+        return self.dataset.to_batches(columns=columns)
+
+    def to_pandas(self, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Materialize (a subset of columns of) the dataset in memory."""
+        return self.dataset.to_table(columns=columns).to_pandas()
+
+    def head(self, n: int = 5) -> pd.DataFrame:
+        return self.dataset.head(n).to_pandas()
+
+    def value_counts(self, column: str) -> pd.Series:
+        """Count of each distinct value, largest first, like Series.value_counts."""
+        counts = {}
+        for batch in self.batches([column]):
+            partial = pc.value_counts(batch.column(0).drop_null())
+            for value, count in zip(partial.field("values").to_pylist(), partial.field("counts").to_pylist()):
+                counts[value] = counts.get(value, 0) + count
+        return pd.Series(counts, dtype="int64").sort_values(ascending=False)
+
+    def groupby_sum(self, by: str, column: str) -> pd.Series:
+        """Sum of a column per group, like df.groupby(by)[column].sum()."""
+        return self.groupby_agg(by, column, "sum")
+
+    def groupby_agg(self, by: str, column: str, agg: str = "sum") -> pd.Series:
+        """sum, count or mean of a column per group, like df.groupby(by)[column].agg(agg).
+
+        Each batch is hash-aggregated into per-group sums and counts that are
+        folded into the running totals, so memory is bounded by the number of
+        groups. As in pandas, missing keys are dropped, a group with no values
+        sums to 0 and its mean is NaN.
+        """
+        if agg not in ("sum", "count", "mean"):
+            raise ValueError(f"Unsupported aggregation '{agg}'; use sum, mean or count")
+        # Counts work on any column; only sum and mean need numbers
+        functions = ["count"] if agg == "count" else ["sum", "count"]
+        names = [by] + [f"{column}_{function}" for function in functions]
+        running = None
+        for batch in self.batches([by, column]):
+            partial = pa.Table.from_batches([batch]).group_by(by).aggregate([(column, function) for function in functions])
+            partial = partial.select(names)
+            if running is not None:
+                partial = pa.concat_tables([running, partial]).group_by(by).aggregate([(name, "sum") for name in names[1:]])
+                partial = partial.select([by] + [f"{name}_sum" for name in names[1:]]).rename_columns(names)
+            running = partial
+        if running is None:
+            return pd.Series(dtype="int64" if agg == "count" else "float64")
+        running = running.filter(pc.is_valid(running.column(by)))
+        counts = running.column(f"{column}_count").to_numpy(zero_copy_only=False).astype(np.int64)
+        if agg == "count":
+            values = counts
+        else:
+            sums = pc.fill_null(running.column(f"{column}_sum"), 0).to_numpy(zero_copy_only=False)
+            if agg == "sum":
+                values = sums
+            else:
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    values = sums / counts
+        return pd.Series(values, index=running.column(by).to_pylist()).sort_index()
+
+    def histogram(self, column: str, bins: int = 10):
+        """Equal-width histogram over the column's range, computed in two passes."""
+        low, high = None, None
+        for batch in self.batches([column]):
+            bounds = pc.min_max(batch.column(0))
+            if bounds["min"].is_valid:
+                low = bounds["min"].as_py() if low is None else min(low, bounds["min"].as_py())
+                high = bounds["max"].as_py() if high is None else max(high, bounds["max"].as_py())
+        if low is None:
+            return np.zeros(bins, dtype=np.int64), np.linspace(0, 1, bins + 1)
+        # Same bins as pd.cut on an in-memory frame
+        edges = cut_edges(low, high, bins)
+        counts = np.zeros(bins, dtype=np.int64)
+        for batch in self.batches([column]):
+            values = batch.column(0).drop_null().to_numpy(zero_copy_only=False)
+            counts += cut_counts(values, edges)
+        return counts, edges
+
+    def density(self, x: str, y: str, bins: int = DENSITY_BINS):
+        """2D histogram of two columns, computed in two streaming passes."""
+        bounds = (np.inf, -np.inf, np.inf, -np.inf)
+        for batch in self.batches([x, y]):
+            xs, ys = (column.to_numpy(zero_copy_only=False) for column in batch.columns)
+            bounds = merge_bounds(bounds, density_bounds(xs, ys))
+        x_edges, y_edges = density_edges(bounds, bins)
+        counts = np.zeros((bins, bins), dtype=np.int64)
+        for batch in self.batches([x, y]):
+            xs, ys = (column.to_numpy(zero_copy_only=False) for column in batch.columns)
+            counts += density_counts(xs, ys, x_edges, y_edges)
+        return counts, x_edges, y_edges
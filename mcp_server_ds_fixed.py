@@ -1,6 +1,6 @@
-from mcp.server.fastmcp import FastMCP
+from mcp.server.fastmcp import FastMCP, Context
 from mcp.shared.exceptions import McpError
-from mcp.types import TextContent, EmbeddedResource, INTERNAL_ERROR, Prompt, PromptArgument, Resource  
+from mcp.types import TextContent, EmbeddedResource, ErrorData, INTERNAL_ERROR, Prompt, PromptArgument, Resource  
 import pandas as pd
 import numpy as np
 import scipy
@@ -10,43 +10,301 @@ from io import StringIO
 import sys
 import os
 import re
+import ast
 import json
+import time
+import atexit
+import hashlib
+import threading
+import weakref
 from typing import Optional, List
+from lazy_frame import LazyFrame, open_lazy_csv
+from moments import Moments
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Base frames are shared between sessions as shallow copies, which is only
+# safe with Copy-on-Write (always on from pandas 3)
+if int(pd.__version__.split(".")[0]) == 2:
+    pd.set_option("mode.copy_on_write", True)
 
 mcp = FastMCP(name="mcp_server_ds", host="127.0.0.1", port=8003)
 
-# In-memory data store for loaded DataFrames
-_dataframes = {}
-_df_count = 0
-_notes: list[str] = []
+class _Session:
+    """In-memory data store for the DataFrames of one client session."""
+
+    def __init__(self):
+        self.dataframes = {}
+        self.df_count = 0
+        self.notes: list[str] = []
+        # Lineage of frames saved by run_script: each derived frame maps to
+        # the script that produced it and the versions of the frames it read
+        self.versions: dict[str, int] = {}
+        self.lineage: dict[str, dict] = {}
+        # CSV sources of loaded frames, so they can be evicted and reloaded
+        self.sources: dict[str, dict] = {}
+        self.sizes: dict[str, int] = {}
+        self.last_used: dict[str, float] = {}
+        # Frames a running script needs; never evicted while listed
+        self.pinned: list[str] = []
+        # Correlation moments of frames, with the frame version and
+        # fingerprint they describe
+        self.moments: dict[str, tuple[int, object, Moments]] = {}
+        # Snapshot file each frame was last written to, with its fingerprint
+        self.snapshot_files: dict[str, tuple] = {}
+        # Memory-mapped frames restored from a snapshot. Stored frames are
+        # shallow copies of these, and keeping them alive makes Copy-on-Write
+        # copy a read-only mapped block on its first write
+        self.mapped: dict[str, pd.DataFrame] = {}
+        # Content digests of evicted derived frames, to check their rebuilds
+        self.evicted: dict[str, Optional[str]] = {}
+        # Created by use_namespace, so other MCP sessions may join it by name
+        self.named = False
+        self.touched = time.monotonic()
+
+    def known(self, df_name: str) -> bool:
+        """Whether a frame is stored or can be rebuilt after eviction."""
+        return df_name in self.dataframes or df_name in self.sources or df_name in self.lineage
+
+_DEFAULT_SESSION = "default"
+_sessions: dict[str, _Session] = {_DEFAULT_SESSION: _Session()}
+# MCP session ids switched to a named namespace with use_namespace.
+# Namespaces keyed by a raw MCP session id belong to that client alone
+_aliases: dict[str, str] = {}
+
+# Per-session memory quota and idle lifetime
+_SESSION_QUOTA = int(float(os.environ.get("MCP_DS_SESSION_QUOTA_MB", "4096")) * 2**20)
+_SESSION_TTL = float(os.environ.get("MCP_DS_SESSION_TTL", "21600"))
+
+# CSVs above this size are opened as disk-backed LazyFrames by default
+_LAZY_CSV_BYTES = int(float(os.environ.get("MCP_DS_LAZY_CSV_MB", "2048")) * 2**20)
+
+# Parsed CSVs shared read-only across sessions, keyed by file identity
+_shared_frames = weakref.WeakValueDictionary()
+
+# Snapshots of the store for warm restarts; disabled unless a directory is set
+_SNAPSHOT_DIR = os.environ.get("MCP_DS_SNAPSHOT_DIR")
+_SNAPSHOT_INTERVAL = float(os.environ.get("MCP_DS_SNAPSHOT_INTERVAL", "0"))
+_snapshot_lock = threading.Lock()
 
-def _next_df_name():
-    global _df_count
-    _df_count += 1
-    return f"df_{_df_count}"
+def _request_session_id(ctx: Context = None) -> str:
+    """The MCP session id of the current request, or the default one."""
+    try:
+        request = ctx.request_context.request
+    except (AttributeError, ValueError):
+        request = None
+    if request is None:
+        return _DEFAULT_SESSION
+    return request.headers.get("mcp-session-id") or _DEFAULT_SESSION
+
+def _session(ctx: Context = None) -> _Session:
+    """Return the namespace of the MCP session making the current request.
+
+    Requests without a session id (stdio, direct calls) share the default
+    namespace; sessions switched with use_namespace get the named one.
+    Namespaces idle for longer than MCP_DS_SESSION_TTL are dropped.
+    """
+    request_id = _request_session_id(ctx)
+    session_id = _aliases.get(request_id, request_id)
+    now = time.monotonic()
+    for expired in [sid for sid, s in _sessions.items() if sid != _DEFAULT_SESSION and now - s.touched > _SESSION_TTL]:
+        del _sessions[expired]
+    for alias in [alias for alias, sid in _aliases.items() if sid not in _sessions and alias != request_id]:
+        del _aliases[alias]
+    session = _sessions.setdefault(session_id, _Session())
+    session.touched = now
+    return session
+
+def _next_df_name(session: _Session):
+    session.df_count += 1
+    return f"df_{session.df_count}"
+
+def _frame_nbytes(value) -> int:
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(np.sum(value.memory_usage(deep=True)))
+    return 0
+
+def _file_key(csv_path: str) -> tuple:
+    """Identity of a file version: its real path, size and modification time."""
+    stat = os.stat(csv_path)
+    return (os.path.realpath(csv_path), stat.st_size, stat.st_mtime_ns)
+
+def _read_shared_csv(csv_path: str) -> tuple[tuple, pd.DataFrame]:
+    """Parse a CSV once per file version and share the result across sessions."""
+    key = _file_key(csv_path)
+    base = _shared_frames.get(key)
+    if base is None:
+        try:
+            base = pd.read_csv(csv_path)
+        except UnicodeDecodeError:
+            base = pd.read_csv(csv_path, encoding="latin1")
+        _shared_frames[key] = base
+    return key, base
 
 @mcp.tool()
-def load_csv(csv_path: str, df_name: Optional[str] = None) -> list:
-    """Load a local CSV file into a DataFrame."""
-    global _dataframes, _notes
+def load_csv(csv_path: str, df_name: Optional[str] = None, lazy: Optional[bool] = None,
+             ctx: Context = None) -> list:
+    """Load a local CSV file into a DataFrame.
+
+    With lazy=True (the default for files above MCP_DS_LAZY_CSV_MB) the file is
+    registered as a disk-backed LazyFrame instead, and chart aggregations over
+    it are streamed in batches.
+    """
+    session = _session(ctx)
     if not df_name:
-        df_name = _next_df_name()
+        df_name = _next_df_name(session)
     try:
-        _dataframes[df_name] = pd.read_csv(csv_path)
-    except UnicodeDecodeError:
-        _dataframes[df_name] = pd.read_csv(csv_path, encoding="latin1")
+        if lazy is None:
+            lazy = os.path.getsize(csv_path) > _LAZY_CSV_BYTES
+        if lazy:
+            key, df = _file_key(csv_path), open_lazy_csv(csv_path)
+        else:
+            key, base = _read_shared_csv(csv_path)
+            # The session gets its own shallow copy so the shared base stays read-only
+            df = base.copy(deep=False)
     except Exception as e:
-        raise McpError(INTERNAL_ERROR, f"Error loading CSV: {str(e)}")
-    _notes.append(f"Successfully loaded CSV into dataframe '{df_name}'")
-    return [TextContent(type="text", text=f"Successfully loaded CSV into dataframe '{df_name}'")]
+        raise McpError(ErrorData(code=INTERNAL_ERROR, message=f"Error loading CSV: {str(e)}"))
+    # A reloaded frame is a source again; anything derived from it goes stale
+    session.lineage.pop(df_name, None)
+    session.sources[df_name] = {"csv_path": csv_path, "key": key, "lazy": lazy}
+    if not lazy:
+        session.sources[df_name]["base"] = base
+    _set_dataframe(session, df_name, df)
+    kind = "lazy dataframe" if lazy else "dataframe"
+    session.notes.append(f"Successfully loaded CSV into {kind} '{df_name}'")
+    return [TextContent(type="text", text=f"Successfully loaded CSV into {kind} '{df_name}'")]
 
-@mcp.tool()
-def run_script(script: str, save_to_memory: Optional[List[str]] = None) -> list:
-    """Execute a Python script for data analytics tasks."""
-    global _dataframes, _notes
-    
+def _script_inputs(session: _Session, script: str) -> list[str]:
+    """Names of stored DataFrames that a script reads."""
+    try:
+        tree = ast.parse(script)
+    except SyntaxError:
+        return []
+    names = {
+        node.id for node in ast.walk(tree)
+        if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load)
+    }
+    return sorted(name for name in names if session.known(name))
+
+def _upstream(session: _Session, df_name: str) -> set:
+    """All frames a derived frame transitively depends on."""
+    seen = set()
+    stack = [df_name]
+    while stack:
+        entry = session.lineage.get(stack.pop())
+        if entry is None:
+            continue
+        for name in entry["inputs"]:
+            if name not in seen:
+                seen.add(name)
+                stack.append(name)
+    return seen
+
+def _content_digest(value) -> Optional[str]:
+    """Hash of a frame's labels and values, or None if they cannot be hashed."""
+    if not isinstance(value, (pd.DataFrame, pd.Series)):
+        return None
+    try:
+        hashes = pd.util.hash_pandas_object(value, index=True).to_numpy()
+    except TypeError:
+        return None
+    if isinstance(value, pd.DataFrame):
+        labels = repr((list(value.columns), [str(dtype) for dtype in value.dtypes]))
+    else:
+        labels = repr((value.name, str(value.dtype)))
+    return hashlib.sha1(hashes.tobytes() + labels.encode("utf-8")).hexdigest()
+
+def _set_dataframe(session: _Session, df_name: str, value, changed: bool = True) -> None:
+    """Store a frame, bumping its version so dependents become stale.
+
+    Rebuilding an evicted frame from unchanged inputs passes changed=False so
+    nothing downstream is recomputed.
+    """
+    previous = session.dataframes.get(df_name)
+    session.evicted.pop(df_name, None)
+    session.dataframes[df_name] = value
+    session.sizes[df_name] = _frame_nbytes(value)
+    session.last_used[df_name] = time.monotonic()
+    if changed or df_name not in session.versions:
+        session.versions[df_name] = session.versions.get(df_name, 0) + 1
+        cached = session.moments.pop(df_name, None)
+        # Appending rows only needs the new rows folded into the moments
+        moments = cached and cached[2].extended(previous, value)
+        if moments is not None:
+            session.moments[df_name] = (session.versions[df_name], _fingerprint(value), moments)
+    _enforce_quota(session, keep=df_name)
+
+def _enforce_quota(session: _Session, keep: Optional[str]) -> None:
+    """Evict least recently used rebuildable frames until under quota."""
+    total = sum(session.sizes.get(name, 0) for name in session.dataframes)
+    if total <= _SESSION_QUOTA:
+        return
+    # Frames without an in-memory size (LazyFrames, models) free nothing when evicted
+    candidates = sorted(
+        (name for name in session.dataframes
+         if name != keep and name not in session.pinned and session.sizes.get(name, 0) > 0
+         and (name in session.sources or name in session.lineage)),
+        key=lambda name: session.last_used.get(name, 0),
+    )
+    for name in candidates:
+        if total <= _SESSION_QUOTA:
+            break
+        total -= session.sizes.pop(name, 0)
+        if name in session.lineage:
+            # A replay may not reproduce the frame (e.g. df.sample())
+            session.evicted[name] = _content_digest(session.dataframes[name])
+        del session.dataframes[name]
+        session.sources.get(name, {}).pop("base", None)
+        session.notes.append(f"Evicted dataframe '{name}' to stay within the session memory quota")
+    if total > _SESSION_QUOTA:
+        session.notes.append(f"Session is using {total / 2**20:.0f} MB, above its {_SESSION_QUOTA / 2**20:.0f} MB quota")
+
+def _buffers(values):
+    """Addresses of the memory behind a column's values."""
+    if isinstance(values, np.ndarray):
+        return (values.__array_interface__["data"][0], values.shape, values.strides)
+    if hasattr(values, "_pa_array"):
+        return tuple(buf.address if buf is not None else 0 for chunk in values._pa_array.chunks for buf in chunk.buffers())
+    if hasattr(values, "_ndarray"):
+        return _buffers(values._ndarray)
+    if hasattr(values, "_data") and hasattr(values, "_mask"):
+        return _buffers(values._data), _buffers(values._mask)
+    return id(values)
+
+def _fingerprint(value):
+    """Cheap identity of a frame's contents: its shape, labels and data buffers.
+
+    Scripts are handed shallow copies of the stored frames, and Copy-on-Write
+    gives any column written in place new buffers, so an edit always changes
+    the fingerprint without the data being hashed.
+    """
+    if not isinstance(value, (pd.DataFrame, pd.Series)):
+        return None
+    index = value.index
+    if isinstance(index, pd.RangeIndex):
+        labels = (index.start, index.stop, index.step)
+    else:
+        labels = _buffers(index.array)
+    if isinstance(value, pd.Series):
+        return (value.shape, value.name, labels, _buffers(value.array))
+    columns = [_buffers(value.iloc[:, i].array) for i in range(value.shape[1])]
+    return (value.shape, list(value.columns), labels, columns)
+
+def _execute_script(script: str, frames: dict) -> tuple[dict, str, dict]:
+    """Run a script against the given frames.
+
+    Returns its locals, its stdout and the frames it edited in place (as the
+    edited copies); the frames passed in are never modified.
+    """
+    handed = {
+        name: value.copy(deep=False) if isinstance(value, (pd.DataFrame, pd.Series)) else value
+        for name, value in frames.items()
+    }
     # Add plotly and json to local environment for chart generation
-    local_dict = {**_dataframes, 'json': json}
+    local_dict = {**handed, 'json': json}
     
     # Add plotly imports if available
     try:
@@ -57,12 +315,10 @@ def run_script(script: str, save_to_memory: Optional[List[str]] = None) -> list:
     except ImportError:
         pass
     
+    stdout_capture = StringIO()
+    old_stdout = sys.stdout
+    sys.stdout = stdout_capture
     try:
-        stdout_capture = StringIO()
-        old_stdout = sys.stdout
-        sys.stdout = stdout_capture
-        _notes.append(f"Running script: \n{script}")
-        
         # Execute the script with enhanced environment
         exec(script, {
             'pd': pd, 
@@ -72,21 +328,160 @@ def run_script(script: str, save_to_memory: Optional[List[str]] = None) -> list:
             'statsmodels': sm,
             'json': json
         }, local_dict)
-        
-        std_out_script = stdout_capture.getvalue()
-    except Exception as e:
-        raise McpError(INTERNAL_ERROR, f"Error running script: {str(e)}")
     finally:
         sys.stdout = old_stdout
+    edited = {
+        name: value for name, value in handed.items()
+        if _fingerprint(value) != _fingerprint(frames[name])
+    }
+    return local_dict, stdout_capture.getvalue(), edited
+
+def _refresh(session: _Session, df_name: str, _active: Optional[set] = None) -> None:
+    """Make a frame current: recompute it if anything upstream has changed and
+    rebuild it if it was evicted.
+
+    Frames are invalidated lazily: nothing is rerun when a source is reloaded,
+    only when a stale frame is next accessed, and then only the stale part of
+    the lineage graph is replayed.
+    """
+    source = session.sources.get(df_name)
+    if df_name not in session.dataframes and source is not None:
+        try:
+            if source.get("lazy"):
+                key = _file_key(source["csv_path"])
+                changed = key != source.get("key")
+                source.update(key=key)
+                _set_dataframe(session, df_name, open_lazy_csv(source["csv_path"]), changed=changed)
+            else:
+                key, base = _read_shared_csv(source["csv_path"])
+                changed = key != source.get("key")
+                source.update(key=key, base=base)
+                _set_dataframe(session, df_name, base.copy(deep=False), changed=changed)
+        except Exception as e:
+            raise McpError(ErrorData(code=INTERNAL_ERROR, message=f"Error reloading '{df_name}': {str(e)}"))
+    entry = session.lineage.get(df_name)
+    if entry is None:
+        return
+    _active = _active if _active is not None else set()
+    if df_name in _active:
+        return
+    _active.add(df_name)
+    inputs = list(entry["inputs"])
+    session.pinned.extend(inputs)
+    try:
+        for name in inputs:
+            _refresh(session, name, _active)
+        changed = any(session.versions.get(name) != version for name, version in entry["inputs"].items())
+        if not changed and df_name in session.dataframes:
+            return
+        missing = [name for name in inputs if name not in session.dataframes]
+        if missing:
+            raise McpError(ErrorData(code=INTERNAL_ERROR, message=f"Cannot recompute '{df_name}': upstream dataframe(s) {missing} no longer exist"))
+        session.notes.append(f"Recomputing {entry['outputs']} because upstream dataframes changed" if changed else f"Rebuilding evicted dataframe '{df_name}'")
+        try:
+            # Replays only produce their outputs; edits to inputs are dropped
+            local_dict, _, _ = _execute_script(entry["script"], session.dataframes)
+        except Exception as e:
+            raise McpError(ErrorData(code=INTERNAL_ERROR, message=f"Error recomputing '{df_name}': {str(e)}"))
+    finally:
+        for name in inputs:
+            session.pinned.remove(name)
+    for name in entry["outputs"]:
+        if session.lineage.get(name) is entry and name in local_dict:
+            if changed or name not in session.dataframes:
+                # A rebuild keeps its version only if it reproduced the evicted frame
+                digest = session.evicted.get(name)
+                rebuilt = changed or digest is None or _content_digest(local_dict[name]) != digest
+                if rebuilt and not changed:
+                    session.notes.append(f"Rebuilt dataframe '{name}' differs from the evicted one; dependents will be recomputed")
+                _set_dataframe(session, name, local_dict[name], changed=rebuilt)
+    entry["inputs"] = {name: session.versions[name] for name in inputs}
+
+def _get_dataframe(session: _Session, df_name: str):
+    """Return a stored frame, recomputing or reloading it first if needed."""
+    _refresh(session, df_name)
+    session.last_used[df_name] = time.monotonic()
+    return session.dataframes[df_name]
+
+def _frame_moments(session: _Session, df_name: str) -> Moments:
+    """Correlation moments of a frame's numeric columns, computed once per version.
+
+    The cache is also keyed on the frame's fingerprint, so moments of a frame
+    whose contents changed are never served even if its version did not move.
+    """
+    df = _get_dataframe(session, df_name)
+    version, fingerprint = session.versions[df_name], _fingerprint(df)
+    cached = session.moments.get(df_name)
+    if cached is not None and cached[:2] == (version, fingerprint):
+        return cached[2]
+    if isinstance(df, LazyFrame):
+        columns = [col for col in df.columns if df.is_numeric(col)]
+        batches = (
+            batch.to_pandas().to_numpy(dtype=np.float64, na_value=np.nan)
+            for batch in df.batches(columns) if batch.num_rows
+        )
+        moments = Moments.from_batches(columns, batches)
+    elif isinstance(df, pd.DataFrame):
+        moments = Moments.from_frame(df)
+    else:
+        raise ValueError(f"'{df_name}' is a {type(df).__name__}, not a DataFrame")
+    session.moments[df_name] = (version, fingerprint, moments)
+    return moments
+
+def _record_lineage(session: _Session, script: str, inputs: list[str], outputs: list[str]) -> None:
+    """Remember which script and input versions produced the saved frames."""
+    entry = {
+        "script": script,
+        "inputs": {name: session.versions[name] for name in inputs if name not in outputs},
+        "outputs": outputs,
+    }
+    for name in outputs:
+        # Frames that rewrite themselves or feed their own inputs cannot be
+        # replayed, so they become new base frames instead.
+        if name in inputs or any(name in _upstream(session, i) for i in entry["inputs"]):
+            session.lineage.pop(name, None)
+        else:
+            session.lineage[name] = entry
+
+@mcp.tool()
+def run_script(script: str, save_to_memory: Optional[List[str]] = None, ctx: Context = None) -> list:
+    """Execute a Python script for data analytics tasks."""
+    session = _session(ctx)
+    
+    inputs = _script_inputs(session, script)
+    session.pinned.extend(inputs)
+    try:
+        for name in inputs:
+            _get_dataframe(session, name)
+        session.notes.append(f"Running script: \n{script}")
+        local_dict, std_out_script, edited = _execute_script(script, session.dataframes)
+    except McpError:
+        raise
+    except Exception as e:
+        raise McpError(ErrorData(code=INTERNAL_ERROR, message=f"Error running script: {str(e)}"))
+    finally:
+        for name in inputs:
+            session.pinned.remove(name)
     
+    saved = [df_name for df_name in save_to_memory or [] if df_name in local_dict]
+    for df_name, value in edited.items():
+        if df_name in saved:
+            continue
+        # An edited frame can no longer be reloaded from its CSV or replayed
+        # from its script, so it must not be evicted either
+        session.sources.pop(df_name, None)
+        session.lineage.pop(df_name, None)
+        session.notes.append(f"Dataframe '{df_name}' was modified in place")
+        _set_dataframe(session, df_name, value)
     if save_to_memory:
-        for df_name in save_to_memory:
-            if df_name in local_dict:
-                _notes.append(f"Saving dataframe '{df_name}' to memory")
-                _dataframes[df_name] = local_dict.get(df_name)
+        for df_name in saved:
+            session.notes.append(f"Saving dataframe '{df_name}' to memory")
+            session.sources.pop(df_name, None)
+            _set_dataframe(session, df_name, local_dict.get(df_name))
+        _record_lineage(session, script, inputs, saved)
     
     output = std_out_script if std_out_script else "No output"
-    _notes.append(f"Result: {output}")
+    session.notes.append(f"Result: {output}")
 
     # Enhanced Plotly JSON detection and formatting
     plotly_json = None
@@ -122,10 +517,202 @@ def run_script(script: str, save_to_memory: Optional[List[str]] = None) -> list:
         return [TextContent(type="text", text=f"**Script Output:**\n\n{output}")]
 
 @mcp.tool()
-def get_notes() -> list:
+def get_lineage(df_name: Optional[str] = None, ctx: Context = None) -> list:
+    """Show which script and source dataframes produced each derived dataframe."""
+    session = _session(ctx)
+    names = [df_name] if df_name else sorted(session.lineage)
+    lines = []
+    for name in names:
+        entry = session.lineage.get(name)
+        if entry is None:
+            lines.append(f"'{name}' is a source dataframe")
+            continue
+        stale = any(session.versions.get(i) != v for i, v in entry["inputs"].items())
+        inputs = ", ".join(f"'{i}'" for i in entry["inputs"]) or "none"
+        lines.append(f"'{name}' <- inputs: {inputs}{' (stale)' if stale else ''}\n{entry['script']}")
+    return [TextContent(type="text", text="\n\n".join(lines) or "No derived dataframes")]
+
+@mcp.tool()
+def use_namespace(namespace: Optional[str] = None, ctx: Context = None) -> list:
+    """Switch this client to a named namespace of dataframes, creating it if needed.
+
+    Named namespaces outlive MCP sessions and are kept in snapshots, so after
+    a server restart a client gets its dataframes back by switching to the
+    same name. Another client's own session namespace cannot be joined.
+    Without a name, lists this client's namespace and the named ones.
+    """
+    request_id = _request_session_id(ctx)
+    if not namespace:
+        current = _aliases.get(request_id, request_id)
+        lines = []
+        for sid, session in _sessions.items():
+            if sid == current or session.named:
+                names = sorted(set(session.dataframes) | set(session.sources) | set(session.lineage))
+                lines.append(f"'{sid}'{' (current)' if sid == current else ''}: {', '.join(names) or 'no dataframes'}")
+        return [TextContent(type="text", text="\n".join(lines))]
+    existing = _sessions.get(namespace)
+    if namespace != request_id and existing is not None and not existing.named:
+        return [TextContent(type="text", text=f"Namespace '{namespace}' belongs to another session and cannot be joined")]
+    if namespace == request_id:
+        _aliases.pop(request_id, None)
+    else:
+        _aliases[request_id] = namespace
+    session = _session(ctx)
+    session.named = session.named or namespace != request_id
+    names = sorted(set(session.dataframes) | set(session.sources) | set(session.lineage))
+    return [TextContent(type="text", text=f"Using namespace '{namespace}' with dataframes: {', '.join(names) or 'none'}")]
+
+@mcp.tool()
+def get_notes(ctx: Context = None) -> list:
     """Return the notes generated by the data exploration server."""
-    global _notes
-    return [TextContent(type="text", text="\n".join(_notes))]
+    return [TextContent(type="text", text="\n".join(_session(ctx).notes))]
+
+def _snapshot_file(session_id: str, df_name: str, version: int, fingerprint) -> str:
+    digest = hashlib.sha1(f"{session_id}/{df_name}".encode("utf-8")).hexdigest()[:16]
+    content = hashlib.sha1(repr(fingerprint).encode("utf-8")).hexdigest()[:8]
+    return f"{digest}_{version}_{content}.arrow"
+
+def _save_snapshot(snapshot_dir: str) -> int:
+    """Write the DataFrames of the default and named namespaces to Arrow IPC
+    files plus a JSON manifest.
+
+    Files are named by frame, version and fingerprint, so frames unchanged
+    since the last snapshot are not rewritten. The manifest is replaced atomically last, so a
+    crash mid-snapshot leaves the previous snapshot intact. Evicted frames are
+    recorded by their source or lineage only. Frames Arrow cannot convert are
+    listed as skipped rather than failing the snapshot.
+    """
+    if pa is None:
+        raise McpError(ErrorData(code=INTERNAL_ERROR, message="Snapshots require pyarrow to be installed"))
+    with _snapshot_lock:
+        frames_dir = os.path.join(snapshot_dir, "frames")
+        os.makedirs(frames_dir, exist_ok=True)
+        written, sessions = set(), {}
+        for session_id, session in dict(_sessions).items():
+            if session_id != _DEFAULT_SESSION and not session.named:
+                # Unreachable after a restart: clients reconnect with new session ids
+                continue
+            frames, skipped = {}, []
+            for df_name, value in dict(session.dataframes).items():
+                if isinstance(value, LazyFrame):
+                    # Already on disk; restored from its source entry
+                    continue
+                if not isinstance(value, pd.DataFrame):
+                    skipped.append(df_name)
+                    continue
+                fingerprint = _fingerprint(value)
+                last = session.snapshot_files.get(df_name)
+                if last is not None and last[0] == fingerprint:
+                    file_name = last[1]
+                else:
+                    file_name = _snapshot_file(session_id, df_name, session.versions.get(df_name, 0), fingerprint)
+                path = os.path.join(frames_dir, file_name)
+                if not os.path.exists(path):
+                    try:
+                        table = pa.Table.from_pandas(value, preserve_index=True)
+                    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                        # e.g. mixed-type object columns; the rest of the snapshot goes on
+                        skipped.append(df_name)
+                        continue
+                    with pa.OSFile(path + ".tmp", "wb") as sink:
+                        with pa.ipc.new_file(sink, table.schema) as writer:
+                            writer.write_table(table)
+                    os.replace(path + ".tmp", path)
+                session.snapshot_files[df_name] = (fingerprint, file_name)
+                frames[df_name] = file_name
+            written.update(frames.values())
+            sources = {
+                name: {"csv_path": source["csv_path"], "key": list(source.get("key") or ()), "lazy": source.get("lazy", False)}
+                for name, source in session.sources.items()
+            }
+            sessions[session_id] = {
+                "named": session.named,
+                "df_count": session.df_count,
+                "notes": list(session.notes),
+                "versions": {name: version for name, version in session.versions.items() if name in frames or name in sources or name in session.lineage},
+                "lineage": dict(session.lineage),
+                "sources": sources,
+                "frames": frames,
+                "skipped": skipped,
+                "evicted": dict(session.evicted),
+            }
+        manifest_path = os.path.join(snapshot_dir, "manifest.json")
+        with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"sessions": sessions}, f)
+        os.replace(manifest_path + ".tmp", manifest_path)
+        for file_name in set(os.listdir(frames_dir)) - written:
+            try:
+                os.remove(os.path.join(frames_dir, file_name))
+            except OSError:
+                # Still mapped by a restored frame on some platforms; removed next time
+                pass
+        return len(written)
+
+def _restore_snapshot(snapshot_dir: str) -> int:
+    """Load a snapshot written by _save_snapshot, memory-mapping each frame.
+
+    Column buffers stay backed by the mapped files, so restoring is bounded by
+    metadata work rather than by the size of the data. The mapped frames are
+    kept as read-only bases and the session gets shallow copies to edit.
+
+    Only the default namespace and named ones are saved and restored. Clients
+    without a session id get the default namespace back; HTTP clients are
+    given a new session id on reconnect and switch back to their named
+    namespace with use_namespace.
+    """
+    manifest_path = os.path.join(snapshot_dir, "manifest.json")
+    if pa is None or not os.path.exists(manifest_path):
+        return 0
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    count = 0
+    for session_id, saved in manifest["sessions"].items():
+        if session_id != _DEFAULT_SESSION and not saved.get("named"):
+            continue
+        session = _sessions.setdefault(session_id, _Session())
+        session.named = session_id != _DEFAULT_SESSION
+        for df_name, file_name in saved["frames"].items():
+            source = pa.memory_map(os.path.join(snapshot_dir, "frames", file_name))
+            base = pa.ipc.open_file(source).read_all().to_pandas(split_blocks=True)
+            session.mapped[df_name] = base
+            df = base.copy(deep=False)
+            session.dataframes[df_name] = df
+            session.sizes[df_name] = _frame_nbytes(df)
+            session.snapshot_files[df_name] = (_fingerprint(df), file_name)
+            count += 1
+        session.versions.update(saved["versions"])
+        session.evicted.update(saved.get("evicted", {}))
+        for df_name, source in saved["sources"].items():
+            session.sources[df_name] = {"csv_path": source["csv_path"], "key": tuple(source["key"]), "lazy": source["lazy"]}
+        # Entries shared by several outputs of one script stay shared
+        entries = {}
+        for df_name, entry in saved["lineage"].items():
+            key = (entry["script"], tuple(entry["outputs"]))
+            session.lineage[df_name] = entries.setdefault(key, entry)
+        session.df_count = max(session.df_count, saved["df_count"])
+        session.notes.extend(saved["notes"])
+        if saved["skipped"]:
+            session.notes.append(f"Snapshot did not include non-DataFrame values {saved['skipped']}")
+        _enforce_quota(session, keep=None)
+    return count
+
+def _snapshot_periodically(snapshot_dir: str, interval: float) -> None:
+    def run():
+        try:
+            _save_snapshot(snapshot_dir)
+        finally:
+            _snapshot_periodically(snapshot_dir, interval)
+    timer = threading.Timer(interval, run)
+    timer.daemon = True
+    timer.start()
+
+@mcp.tool()
+def save_snapshot() -> list:
+    """Persist all loaded DataFrames so a restarted server can resume instantly."""
+    if not _SNAPSHOT_DIR:
+        raise McpError(ErrorData(code=INTERNAL_ERROR, message="Set MCP_DS_SNAPSHOT_DIR to enable snapshots"))
+    count = _save_snapshot(_SNAPSHOT_DIR)
+    return [TextContent(type="text", text=f"Saved snapshot of {count} dataframe(s) to '{_SNAPSHOT_DIR}'")]
 
 @mcp.prompt()
 def explore_data_prompt():
@@ -152,4 +739,9 @@ def notes_resource():
     ]
 
 if __name__ == "__main__":
+    if _SNAPSHOT_DIR and pa is not None:
+        _restore_snapshot(_SNAPSHOT_DIR)
+        atexit.register(_save_snapshot, _SNAPSHOT_DIR)
+        if _SNAPSHOT_INTERVAL > 0:
+            _snapshot_periodically(_SNAPSHOT_DIR, _SNAPSHOT_INTERVAL)
     mcp.run(transport="streamable-http")
@@ -0,0 +1,112 @@
+"""
+Cached sufficient statistics for correlation and covariance heatmaps.
+For the numeric columns of a frame we keep pairwise counts, sums, sums of
+squares and the cross-product matrix X.T @ X. Any correlation or covariance
+matrix over a subset of those columns is then O(columns^2) to serve, and
+appending rows only costs a pass over the new rows.
+"""
+
+import copy
+import numpy as np
+import pandas as pd
+from typing import List, Optional
+
+class Moments:
+    """Pairwise-complete moments of a set of numeric columns.
+
+    Missing values are handled like DataFrame.corr(): each pair of columns
+    uses the rows where both are present. Values are shifted by a per-column
+    offset before accumulating so large means do not cancel out precision.
+    """
+
+    def __init__(self, columns: List[str], shift: np.ndarray):
+        k = len(columns)
+        self.columns = list(columns)
+        self.shift = shift
+        self.rows = 0
+        # [i, j] entries are taken over the rows where both i and j are present
+        self.counts = np.zeros((k, k))
+        self.sums = np.zeros((k, k))  # sum of column i
+        self.squares = np.zeros((k, k))  # sum of column i squared
+        self.cross = np.zeros((k, k))  # sum of column i times column j
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "Moments":
+        numeric = df.select_dtypes(include=["number"])
+        values = numeric.to_numpy(dtype=np.float64, na_value=np.nan)
+        moments = cls(numeric.columns.tolist(), _shift(values))
+        moments.add(values)
+        return moments
+
+    @classmethod
+    def from_batches(cls, columns: List[str], batches) -> "Moments":
+        """Accumulate moments from an iterable of 2D float arrays, e.g. a LazyFrame scan."""
+        moments = None
+        for values in batches:
+            if moments is None:
+                moments = cls(columns, _shift(values))
+            moments.add(values)
+        return moments if moments is not None else cls(columns, np.zeros(len(columns)))
+
+    def add(self, values: np.ndarray) -> None:
+        """Fold more rows (a 2D array over self.columns) into the statistics."""
+        values = values - self.shift
+        present = ~np.isnan(values)
+        filled = np.where(present, values, 0.0)
+        if present.all():
+            self.counts += len(values)
+            self.sums += filled.sum(axis=0)[:, None]
+            self.squares += (filled * filled).sum(axis=0)[:, None]
+        else:
+            mask = present.astype(np.float64)
+            self.counts += mask.T @ mask
+            self.sums += filled.T @ mask
+            self.squares += (filled * filled).T @ mask
+        self.cross += filled.T @ filled
+        self.rows += len(values)
+
+    def extended(self, old, new) -> Optional["Moments"]:
+        """Moments for `new` if it is `old` with rows appended, else None."""
+        if not isinstance(old, pd.DataFrame) or not isinstance(new, pd.DataFrame):
+            return None
+        if old is new or len(new) <= len(old) or list(new.columns) != list(old.columns):
+            return None
+        if new.select_dtypes(include=["number"]).columns.tolist() != self.columns:
+            return None
+        if len(old) != self.rows or not new[self.columns].iloc[:len(old)].equals(old[self.columns]):
+            return None
+        moments = copy.deepcopy(self)
+        moments.add(new[self.columns].iloc[len(old):].to_numpy(dtype=np.float64, na_value=np.nan))
+        return moments
+
+    def _select(self, columns: Optional[List[str]]):
+        columns = columns or self.columns
+        missing = [column for column in columns if column not in self.columns]
+        if missing:
+            raise ValueError(f"Columns {missing} are not numeric columns of this dataframe")
+        index = np.array([self.columns.index(column) for column in columns], dtype=np.intp)
+        grid = np.ix_(index, index)
+        n, si, sii, sij = self.counts[grid], self.sums[grid], self.squares[grid], self.cross[grid]
+        return columns, n, si, si.T, sii, sii.T, sij
+
+    def covariance(self, columns: Optional[List[str]] = None):
+        """(columns, sample covariance matrix) like DataFrame.cov()."""
+        columns, n, si, sj, _, _, sij = self._select(columns)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return columns, np.where(n > 1, (sij - si * sj / n) / (n - 1), np.nan)
+
+    def correlation(self, columns: Optional[List[str]] = None):
+        """(columns, Pearson correlation matrix) like DataFrame.corr()."""
+        columns, n, si, sj, sii, sjj, sij = self._select(columns)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            centered = sij - si * sj / n
+            scale = np.sqrt((sii - si * si / n) * (sjj - sj * sj / n))
+            corr = np.clip(centered / scale, -1.0, 1.0)
+        return columns, np.where(n > 1, corr, np.nan)
+
+def _shift(values: np.ndarray) -> np.ndarray:
+    """A per-column offset near the data, taken from the first rows."""
+    head = values[:1000]
+    with np.errstate(invalid="ignore"):
+        shift = np.nanmean(head, axis=0) if len(head) else np.zeros(values.shape[1])
+    return np.nan_to_num(shift)
@@ -0,0 +1,76 @@
+"""
+Binned density mode for scatter charts on large frames.
+Instead of sampling rows, every point is counted into a fixed grid in one
+vectorized pass, so the payload is bounded by the number of cells, not rows.
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Tuple
+
+# Above this many rows a scatter chart is sent as a density heatmap
+SCATTER_DENSITY_THRESHOLD = 5000
+DENSITY_BINS = 50
+
+def _as_float(values) -> np.ndarray:
+    if isinstance(values, pd.Series):
+        return values.to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.asarray(values, dtype=np.float64)
+
+def density_bounds(x, y) -> Tuple[float, float, float, float]:
+    """(xmin, xmax, ymin, ymax) over the points where both coordinates are finite."""
+    x, y = _as_float(x), _as_float(y)
+    mask = np.isfinite(x) & np.isfinite(y)
+    if not mask.any():
+        return np.inf, -np.inf, np.inf, -np.inf
+    return (
+        np.min(x, where=mask, initial=np.inf), np.max(x, where=mask, initial=-np.inf),
+        np.min(y, where=mask, initial=np.inf), np.max(y, where=mask, initial=-np.inf),
+    )
+
+def merge_bounds(a, b) -> Tuple[float, float, float, float]:
+    return min(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), max(a[3], b[3])
+
+def density_edges(bounds, bins: int = DENSITY_BINS) -> Tuple[np.ndarray, np.ndarray]:
+    xmin, xmax, ymin, ymax = bounds
+    if xmin > xmax:
+        xmin, xmax, ymin, ymax = 0.0, 1.0, 0.0, 1.0
+    # A degenerate axis still gets a unit-wide range so every point lands in a cell
+    if xmin == xmax:
+        xmin, xmax = xmin - 0.5, xmax + 0.5
+    if ymin == ymax:
+        ymin, ymax = ymin - 0.5, ymax + 0.5
+    return np.linspace(xmin, xmax, bins + 1), np.linspace(ymin, ymax, bins + 1)
+
+def density_counts(x, y, x_edges: np.ndarray, y_edges: np.ndarray) -> np.ndarray:
+    """Count points into the grid; rows of the result are y cells, columns x cells.
+
+    Points outside the edges or with a missing coordinate fall into an
+    overflow cell that is dropped, so no filtered copy of the columns is made.
+    """
+    x, y = _as_float(x), _as_float(y)
+    nx, ny = len(x_edges) - 1, len(y_edges) - 1
+    with np.errstate(invalid="ignore"):
+        ix = np.floor((x - x_edges[0]) * (nx / (x_edges[-1] - x_edges[0])))
+        iy = np.floor((y - y_edges[0]) * (ny / (y_edges[-1] - y_edges[0])))
+        # The upper edge belongs to the last cell, as in np.histogram2d
+        ix[(ix == nx) & (x <= x_edges[-1])] = nx - 1
+        iy[(iy == ny) & (y <= y_edges[-1])] = ny - 1
+        inside = (ix >= 0) & (ix < nx) & (iy >= 0) & (iy < ny)
+    cells = np.where(inside, iy * nx + ix, nx * ny).astype(np.int64)
+    return np.bincount(cells, minlength=nx * ny + 1)[:-1].reshape(ny, nx)
+
+def density_grid(x, y, bins: int = DENSITY_BINS) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """2D histogram of the points: (counts, x_edges, y_edges)."""
+    x_edges, y_edges = density_edges(density_bounds(x, y), bins)
+    return density_counts(x, y, x_edges, y_edges), x_edges, y_edges
+
+def density_chart(counts: np.ndarray, x_edges: np.ndarray, y_edges: np.ndarray, **meta) -> dict:
+    """A heatmap chart of the grid, with cell centers as the axis values."""
+    return {
+        "type": "heatmap",
+        **meta,
+        "x": (x_edges[:-1] + x_edges[1:]) / 2,
+        "y": (y_edges[:-1] + y_edges[1:]) / 2,
+        "z": counts,
+    }
@@ -0,0 +1,60 @@
+"""
+Tests that LazyFrame aggregations match pandas on the same CSV.
+Run with `python -m pytest`.
+"""
+
+import os
+
+import pandas as pd
+
+import lazy_frame
+from batch_aggregate import aggregate_charts, aggregate_lazy_charts
+
+def open_both(tmp_path, monkeypatch, lines):
+    monkeypatch.setattr(lazy_frame, "SPILL_DIR", str(tmp_path / "spill"))
+    monkeypatch.setattr(lazy_frame, "BLOCK_SIZE", 1000)
+    csv_path = tmp_path / "data.csv"
+    csv_path.write_text("\n".join(lines) + "\n")
+    return lazy_frame.open_lazy_csv(str(csv_path)), pd.read_csv(csv_path)
+
+def test_later_values_widen_inferred_types(tmp_path, monkeypatch):
+    lines = ["a,b"] + ["1,2"] * 2000 + ["1.5,text"]
+    lazy, eager = open_both(tmp_path, monkeypatch, lines)
+    assert lazy.to_pandas()["a"].sum() == eager["a"].sum()
+    assert lazy.to_pandas()["b"].tolist()[-1] == "text"
+    assert os.listdir(tmp_path / "spill") == [os.path.basename(lazy.path)]
+
+def test_missing_keys_are_dropped(tmp_path, monkeypatch):
+    lines = ["key,value"] + [f"{['x', 'y', ''][i % 3]},{i}" for i in range(30)]
+    lazy, eager = open_both(tmp_path, monkeypatch, lines)
+    assert lazy.value_counts("key").to_dict() == eager["key"].value_counts().to_dict()
+    assert lazy.groupby_sum("key", "value").to_dict() == eager.groupby("key")["value"].sum().to_dict()
+
+def test_batch_charts_match_in_memory_frame(tmp_path, monkeypatch):
+    lines = ["key,value"] + [f"{['x', 'y', ''][i % 3]},{i % 7 if i % 5 else ''}" for i in range(300)]
+    lazy, eager = open_both(tmp_path, monkeypatch, lines)
+    specs = [
+        {"type": "bar", "column": "value", "group_by": "key", "agg": agg} for agg in ("sum", "mean", "count")
+    ] + [{"type": "pie", "column": "key"}, {"type": "histogram", "column": "value", "bins": 4}]
+    lazy_charts = [chart.to_dict() for chart in aggregate_lazy_charts(lazy, specs)]
+    assert lazy_charts == [chart.to_dict() for chart in aggregate_charts(eager, specs)]
+
+def test_count_works_on_text_columns(tmp_path, monkeypatch):
+    lines = ["key,name"] + [f"{['x', 'y'][i % 2]},{['ann', 'bob', ''][i % 3]}" for i in range(30)]
+    lazy, eager = open_both(tmp_path, monkeypatch, lines)
+    specs = [{"type": "bar", "column": "name", "group_by": "key", "agg": "count"}]
+    lazy_charts = [chart.to_dict() for chart in aggregate_lazy_charts(lazy, specs)]
+    assert lazy_charts == [chart.to_dict() for chart in aggregate_charts(eager, specs)]
+
+def test_lazy_charts_scan_the_file_once(tmp_path, monkeypatch):
+    lines = ["key,value"] + [f"{['x', 'y'][i % 2]},{i}" for i in range(30)]
+    lazy, eager = open_both(tmp_path, monkeypatch, lines)
+    scans = []
+    batches = lazy.batches
+    monkeypatch.setattr(lazy, "batches", lambda columns: scans.append(columns) or batches(columns))
+    specs = [{"type": "bar", "column": "value", "group_by": "key"}, {"type": "pie", "column": "key"}]
+    aggregate_lazy_charts(lazy, specs + [{"type": "histogram", "column": "value", "bins": 4}])
+    assert scans == [["value"], ["key", "value"]]
+    scans.clear()
+    aggregate_lazy_charts(lazy, specs)
+    assert scans == [["key", "value"]]
@@ -0,0 +1,182 @@
+"""
+Tests for the stateful parts of the data exploration server: lineage replay,
+in-place edits, eviction and snapshots. Run with `python -m pytest`.
+"""
+
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+import lazy_frame
+import mcp_server_ds_fixed as server
+
+@pytest.fixture
+def session(monkeypatch):
+    monkeypatch.setattr(server, "_sessions", {server._DEFAULT_SESSION: server._Session()})
+    monkeypatch.setattr(server, "_aliases", {})
+    return server._session()
+
+def write_csv(path, a):
+    pd.DataFrame({"a": a, "b": [v * 10 for v in a]}).to_csv(path, index=False)
+    return str(path)
+
+def test_reload_recomputes_dependents(tmp_path, session):
+    csv_path = write_csv(tmp_path / "data.csv", [1, 2, 3])
+    server.load_csv(csv_path, "df_1")
+    server.run_script("df_2 = df_1[df_1.a > 1]", ["df_2"])
+    assert len(server._get_dataframe(session, "df_2")) == 2
+
+    write_csv(tmp_path / "data.csv", [1, 2, 3, 4, 5])
+    server.load_csv(csv_path, "df_1")
+    assert len(server._get_dataframe(session, "df_2")) == 4
+
+def test_in_place_edit_marks_dependents_stale(tmp_path, session):
+    server.load_csv(write_csv(tmp_path / "data.csv", [1, 2, 3]), "df_1")
+    server.run_script("df_2 = df_1.assign(c=df_1.a + 1)", ["df_2"])
+    version = session.versions["df_1"]
+
+    server.run_script("df_1['a'] = df_1['a'] * 100")
+    assert session.versions["df_1"] == version + 1
+    assert server._get_dataframe(session, "df_2")["c"].tolist() == [101, 201, 301]
+
+def test_read_only_script_changes_nothing(tmp_path, session):
+    server.load_csv(write_csv(tmp_path / "data.csv", [1, 2, 3]), "df_1")
+    version = session.versions["df_1"]
+    server.run_script("print(df_1.describe())")
+    assert session.versions["df_1"] == version
+
+def test_replay_does_not_edit_inputs(tmp_path, session):
+    server.load_csv(write_csv(tmp_path / "data.csv", [1, 2, 3]), "df_1")
+    server.run_script("df_2 = df_1.copy()\ndf_2['a'] = 0", ["df_2"])
+    server.run_script("df_1['b'] = 0")
+    assert server._get_dataframe(session, "df_2")["b"].tolist() == [0, 0, 0]
+    assert server._get_dataframe(session, "df_1")["a"].tolist() == [1, 2, 3]
+
+def restart(monkeypatch, snapshot_dir):
+    """Simulate a server restart: drop every session and restore the snapshot."""
+    monkeypatch.setattr(server, "_sessions", {server._DEFAULT_SESSION: server._Session()})
+    server._restore_snapshot(str(snapshot_dir))
+    return server._session()
+
+def test_snapshot_round_trip_keeps_in_place_edits(tmp_path, monkeypatch, session):
+    server.load_csv(write_csv(tmp_path / "data.csv", [1, 2, 3]), "df_1")
+    server.run_script("df_2 = df_1.copy()", ["df_2"])
+    server._save_snapshot(str(tmp_path / "snapshot"))
+    server.run_script("df_2['c'] = 1")
+    server._save_snapshot(str(tmp_path / "snapshot"))
+
+    restored = restart(monkeypatch, tmp_path / "snapshot")
+    assert server._get_dataframe(restored, "df_2")["c"].tolist() == [1, 1, 1]
+
+def test_restored_frames_are_writable(tmp_path, monkeypatch, session):
+    server.load_csv(write_csv(tmp_path / "data.csv", [1, 2, 3]), "df_1")
+    server._save_snapshot(str(tmp_path / "snapshot"))
+
+    restored = restart(monkeypatch, tmp_path / "snapshot")
+    server.run_script("df_1.loc[0, 'a'] = 100\ndf_1['b'] *= 2")
+    df = server._get_dataframe(restored, "df_1")
+    assert df["a"].tolist() == [100, 2, 3]
+    assert df["b"].tolist() == [20, 40, 60]
+
+def test_evicted_frames_are_rebuilt(tmp_path, monkeypatch, session):
+    monkeypatch.setattr(server, "_SESSION_QUOTA", 1)
+    server.load_csv(write_csv(tmp_path / "data.csv", [1, 2, 3]), "df_1")
+    server.run_script("df_2 = df_1.assign(c=df_1.a * 2)", ["df_2"])
+    server.load_csv(write_csv(tmp_path / "other.csv", [4, 5]), "df_3")
+    assert "df_1" not in session.dataframes and "df_2" not in session.dataframes
+
+    version = session.versions["df_1"]
+    assert server._get_dataframe(session, "df_2")["c"].tolist() == [2, 4, 6]
+    assert session.versions["df_1"] == version
+
+def test_in_place_edits_are_never_evicted(tmp_path, monkeypatch, session):
+    monkeypatch.setattr(server, "_SESSION_QUOTA", 1)
+    server.load_csv(write_csv(tmp_path / "data.csv", [1, 2, 3]), "df_1")
+    server.run_script("df_1['a2'] = df_1.a * 2")
+    server.load_csv(write_csv(tmp_path / "other.csv", [4, 5]), "df_2")
+    assert server._get_dataframe(session, "df_1")["a2"].tolist() == [2, 4, 6]
+
+def client(session_id):
+    """A stand-in for the request context of an HTTP client."""
+    request = SimpleNamespace(headers={"mcp-session-id": session_id})
+    return SimpleNamespace(request_context=SimpleNamespace(request=request))
+
+def test_namespace_survives_restart(tmp_path, monkeypatch, session):
+    server.use_namespace("sales", ctx=client("first-connection"))
+    server.load_csv(write_csv(tmp_path / "data.csv", [1, 2, 3]), "df_1", ctx=client("first-connection"))
+    server._save_snapshot(str(tmp_path / "snapshot"))
+
+    restart(monkeypatch, tmp_path / "snapshot")
+    monkeypatch.setattr(server, "_aliases", {})
+    assert "df_1" not in server._session(client("second-connection")).dataframes
+    server.use_namespace("sales", ctx=client("second-connection"))
+    assert "df_1" in server._session(client("second-connection")).dataframes
+
+def test_moments_follow_in_place_edits(tmp_path, session):
+    server.load_csv(write_csv(tmp_path / "data.csv", [1, 2, 3, 4]), "df_1")
+    assert server._frame_moments(session, "df_1").covariance(["a"])[1][0, 0] == pytest.approx(5 / 3)
+
+    server.run_script("df_1['a'] = df_1['a'] * 10")
+    assert server._frame_moments(session, "df_1").covariance(["a"])[1][0, 0] == pytest.approx(500 / 3)
+
+def test_appended_rows_extend_cached_moments(tmp_path, session):
+    server.load_csv(write_csv(tmp_path / "data.csv", [1, 2, 3, 4]), "df_1")
+    server._frame_moments(session, "df_1")
+    server.run_script("df_1.loc[len(df_1)] = [5, 50]")
+
+    cached = session.moments["df_1"][2]
+    df = server._get_dataframe(session, "df_1")
+    assert server._frame_moments(session, "df_1") is cached
+    assert cached.covariance()[1] == pytest.approx(df.cov().to_numpy())
+
+def test_unconvertible_frames_do_not_fail_the_snapshot(tmp_path, monkeypatch, session):
+    server.load_csv(write_csv(tmp_path / "data.csv", [1, 2, 3]), "df_1")
+    server.run_script("df_2 = pd.DataFrame({'m': [1, 'a', None]})", ["df_2"])
+    server._save_snapshot(str(tmp_path / "snapshot"))
+
+    restored = restart(monkeypatch, tmp_path / "snapshot")
+    assert "df_1" in restored.dataframes
+    assert any("df_2" in note for note in restored.notes)
+
+def test_other_sessions_cannot_be_listed_or_joined(tmp_path, session):
+    server.load_csv(write_csv(tmp_path / "data.csv", [1, 2, 3]), "secret", ctx=client("alice-session"))
+
+    listing = server.use_namespace(ctx=client("bob-session"))[0].text
+    assert "alice-session" not in listing and "secret" not in listing
+    server.use_namespace("alice-session", ctx=client("bob-session"))
+    assert "secret" not in server._session(client("bob-session")).dataframes
+
+def test_lazy_frames_are_not_evicted(tmp_path, monkeypatch, session):
+    monkeypatch.setattr(server, "_SESSION_QUOTA", 1)
+    monkeypatch.setattr(lazy_frame, "SPILL_DIR", str(tmp_path / "spill"))
+    server.load_csv(write_csv(tmp_path / "big.csv", [1, 2, 3]), "df_1", lazy=True)
+    server.load_csv(write_csv(tmp_path / "data.csv", [4, 5]), "df_2")
+    assert "df_1" in session.dataframes
+    assert not any("Evicted dataframe 'df_1'" in note for note in session.notes)
+
+def test_rebuild_that_differs_marks_dependents_stale(tmp_path, monkeypatch, session):
+    server.load_csv(write_csv(tmp_path / "data.csv", list(range(100))), "df_1")
+    server.run_script("df_2 = df_1.sample(frac=0.5)", ["df_2"])
+    server.run_script("df_3 = df_2.a.sum()", ["df_3"])
+    server._get_dataframe(session, "df_3")
+    version = session.versions["df_2"]
+
+    monkeypatch.setattr(server, "_SESSION_QUOTA", 1)
+    server.load_csv(write_csv(tmp_path / "other.csv", [1]), "df_4")
+    assert "df_2" not in session.dataframes
+
+    df_2 = server._get_dataframe(session, "df_2")
+    assert session.versions["df_2"] == version + 1
+    assert server._get_dataframe(session, "df_3") == df_2.a.sum()
+
+def test_changed_lazy_source_marks_dependents_stale(tmp_path, monkeypatch, session):
+    monkeypatch.setattr(lazy_frame, "SPILL_DIR", str(tmp_path / "spill"))
+    csv_path = write_csv(tmp_path / "data.csv", [1, 2, 3])
+    server.load_csv(csv_path, "df_1", lazy=True)
+    server.run_script("df_2 = df_1.to_pandas()", ["df_2"])
+    server._save_snapshot(str(tmp_path / "snapshot"))
+
+    restored = restart(monkeypatch, tmp_path / "snapshot")
+    write_csv(tmp_path / "data.csv", [1, 2, 3, 4])
+    assert len(server._get_dataframe(restored, "df_2")) == 4
@@ -8,6 +8,8 @@ import json
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from chart_payload import ChartPayload, dumps
+from scatter_density import SCATTER_DENSITY_THRESHOLD, density_chart, density_grid
 
 def generate_sample_data():
     """Generate sample DataFrame for testing"""
@@ -33,75 +35,67 @@ def create_line_chart(df):
     """Create line chart data for sales over time"""
     monthly_sales = df.groupby('date')['sales'].sum().round(2)
     
-    return {
-        "type": "line",
-        "title": "Monthly Sales Trend",
-        "x_label": "Month",
-        "y_label": "Sales ($)",
-        "data": [
-            {"x": month, "y": float(sales)} 
-            for month, sales in monthly_sales.items()
-        ]
-    }
+    return ChartPayload.xy(
+        "line", monthly_sales.index.to_numpy(), monthly_sales.to_numpy(),
+        title="Monthly Sales Trend",
+        x_label="Month",
+        y_label="Sales ($)",
+    )
 
 def create_bar_chart(df):
     """Create bar chart data for sales by category"""
     category_sales = df.groupby('category')['sales'].sum().round(2)
     
-    return {
-        "type": "bar",
-        "title": "Sales by Category",
-        "x_label": "Category",
-        "y_label": "Total Sales ($)",
-        "data": [
-            {"label": category, "value": float(sales)} 
-            for category, sales in category_sales.items()
-        ]
-    }
+    return ChartPayload.from_series(
+        "bar", category_sales,
+        title="Sales by Category",
+        x_label="Category",
+        y_label="Total Sales ($)",
+    )
 
 def create_pie_chart(df):
     """Create pie chart data for sales by region"""
     region_sales = df.groupby('region')['sales'].sum()
     total_sales = region_sales.sum()
     
-    return {
-        "type": "pie",
-        "title": "Sales Distribution by Region",
-        "data": [
-            {"label": region, "value": round((sales/total_sales)*100, 1)} 
-            for region, sales in region_sales.items()
-        ]
-    }
+    return ChartPayload.labeled(
+        "pie", region_sales.index, np.round(region_sales.to_numpy() / total_sales * 100, 1),
+        title="Sales Distribution by Region",
+    )
 
 def create_scatter_chart(df):
     """Create scatter chart data for quantity vs sales"""
+    if len(df) > SCATTER_DENSITY_THRESHOLD:
+        # Large datasets: show the density of all points instead of a sample
+        counts, x_edges, y_edges = density_grid(df['quantity'], df['sales'])
+        return density_chart(
+            counts, x_edges, y_edges,
+            title="Quantity vs Sales Amount (point density)",
+            x_label="Quantity",
+            y_label="Sales ($)",
+        )
+    
     sample_data = df.sample(min(50, len(df)))  # Limit to 50 points for clarity
     
-    return {
-        "type": "scatter",
-        "title": "Quantity vs Sales Amount",
-        "x_label": "Quantity",
-        "y_label": "Sales ($)",
-        "data": [
-            {"x": int(row['quantity']), "y": round(row['sales'], 2)} 
-            for _, row in sample_data.iterrows()
-        ]
-    }
+    return ChartPayload.xy(
+        "scatter",
+        sample_data['quantity'].to_numpy(dtype=np.int64),
+        sample_data['sales'].to_numpy().round(2),
+        title="Quantity vs Sales Amount",
+        x_label="Quantity",
+        y_label="Sales ($)",
+    )
 
 def create_area_chart(df):
     """Create area chart data for cumulative sales"""
     monthly_sales = df.groupby('date')['sales'].sum().cumsum().round(2)
     
-    return {
-        "type": "area",
-        "title": "Cumulative Sales Growth",
-        "x_label": "Month",
-        "y_label": "Cumulative Sales ($)",
-        "data": [
-            {"x": month, "y": float(sales)} 
-            for month, sales in monthly_sales.items()
-        ]
-    }
+    return ChartPayload.xy(
+        "area", monthly_sales.index.to_numpy(), monthly_sales.to_numpy(),
+        title="Cumulative Sales Growth",
+        x_label="Month",
+        y_label="Cumulative Sales ($)",
+    )
 
 def simulate_mcp_run_script():
     """Simulate the run_script tool returning visualization data"""
@@ -129,7 +123,7 @@ def simulate_mcp_run_script():
     # Example 1: Single chart
     print("\n🔹 EXAMPLE 1: Single Line Chart")
     print("```recharts")
-    print(json.dumps(charts["line"], indent=2))
+    print(dumps(charts["line"], indent=2))
     print("```")
     
     # Example 2: Multiple charts
@@ -142,7 +136,7 @@ def simulate_mcp_run_script():
         ]
     }
     print("```recharts")
-    print(json.dumps(dashboard, indent=2))
+    print(dumps(dashboard, indent=2))
     print("```")
     
     # Example 3: Analysis text + chart
@@ -166,12 +160,12 @@ The visualization below shows the monthly sales trend:
     
     print(analysis_text)
     print("```recharts")
-    print(json.dumps(charts["line"], indent=2))
+    print(dumps(charts["line"], indent=2))
     print("```")
     
     # Save examples to files for reference
     with open('chart_examples.json', 'w') as f:
-        json.dump(charts, f, indent=2)
+        f.write(dumps(charts, indent=2))
     
     print(f"\n✅ Chart examples saved to 'chart_examples.json'")
     print("\n📝 Copy any of the above examples to test in your MCP frontend!")
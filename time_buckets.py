@@ -0,0 +1,100 @@
+"""
+Time-bucket resampling for datetime trend charts.
+Works on the datetime column alone: timestamps are bucketed as int64 offsets
+at the chosen calendar unit and aggregated with np.bincount, so the DataFrame
+is never copied and no period objects are created.
+"""
+
+import numpy as np
+import pandas as pd
+from typing import Optional, Tuple
+
+# Granularities from finest to coarsest
+GRANULARITIES = ["minute", "hour", "day", "week", "month", "quarter", "year"]
+
+_UNITS = {"minute": "m", "hour": "h", "day": "D", "week": "D", "month": "M", "quarter": "M", "year": "Y"}
+
+def _datetime_values(dates: pd.Series) -> np.ndarray:
+    """The column as a datetime64 array, a view of the data for naive columns."""
+    if getattr(dates.dt, "tz", None) is not None:
+        # Bucket on local wall-clock time, as to_period would
+        dates = dates.dt.tz_localize(None)
+    return dates.to_numpy()
+
+def _bucket_ids(values: np.ndarray, granularity: str) -> np.ndarray:
+    """Integer bucket number of each timestamp at the given granularity."""
+    ticks = values.astype(f"datetime64[{_UNITS[granularity]}]").view(np.int64)
+    if granularity == "week":
+        # The epoch is a Thursday; shift so weeks start on Monday
+        return (ticks + 3) // 7
+    if granularity == "quarter":
+        return ticks // 3
+    return ticks
+
+def _bucket_labels(first: int, count: int, granularity: str) -> np.ndarray:
+    ids = first + np.arange(count, dtype=np.int64)
+    if granularity == "week":
+        starts = (ids * 7 - 3).astype("datetime64[D]")
+        return np.datetime_as_string(starts, unit="D")
+    if granularity == "quarter":
+        years = (ids // 4 + 1970).astype(str)
+        return np.char.add(np.char.add(years, "-Q"), (ids % 4 + 1).astype(str))
+    unit = _UNITS[granularity]
+    return np.datetime_as_string(ids.astype(f"datetime64[{unit}]"), unit=unit)
+
+def choose_granularity(start: np.datetime64, end: np.datetime64, max_points: int) -> str:
+    """The finest granularity that spans start..end in at most max_points buckets."""
+    bounds = np.array([start, end])
+    for granularity in GRANULARITIES:
+        first, last = _bucket_ids(bounds, granularity)
+        if last - first + 1 <= max_points:
+            return granularity
+    return GRANULARITIES[-1]
+
+def resample_time(dates: pd.Series, values: Optional[pd.Series] = None, agg: str = "count",
+                  granularity: Optional[str] = None,
+                  max_points: int = 60) -> Tuple[np.ndarray, np.ndarray, str]:
+    """Aggregate a datetime column into contiguous time buckets.
+
+    Args:
+        dates: Datetime column to bucket
+        values: Column to aggregate (required for sum and mean)
+        agg: One of count, sum, mean
+        granularity: One of GRANULARITIES; picked from the span and max_points if omitted
+        max_points: Point budget used when choosing the granularity
+
+    Returns:
+        (labels, aggregated values, granularity), one entry per bucket from the
+        first to the last timestamp. Empty buckets count as 0 and have a NaN mean.
+    """
+    if agg not in ("count", "sum", "mean"):
+        raise ValueError(f"Unsupported aggregation '{agg}'; use count, sum or mean")
+    if agg != "count" and values is None:
+        raise ValueError(f"Aggregation '{agg}' needs a value column")
+    stamps = _datetime_values(dates)
+    mask = ~np.isnat(stamps)
+    if agg != "count":
+        weights = values.to_numpy(dtype=np.float64, na_value=np.nan)
+        mask &= ~np.isnan(weights)
+    if not mask.any():
+        return np.array([], dtype=str), np.array([], dtype=np.float64), granularity or "day"
+    stamps = stamps[mask]
+    if granularity is None:
+        granularity = choose_granularity(stamps.min(), stamps.max(), max_points)
+    elif granularity not in GRANULARITIES:
+        raise ValueError(f"Unsupported granularity '{granularity}'; use one of {GRANULARITIES}")
+    ids = _bucket_ids(stamps, granularity)
+    first = ids.min()
+    ids -= first
+    buckets = int(ids.max()) + 1
+    counts = np.bincount(ids, minlength=buckets)
+    if agg == "count":
+        result = counts
+    else:
+        sums = np.bincount(ids, weights=weights[mask], minlength=buckets)
+        if agg == "sum":
+            result = sums
+        else:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                result = sums / counts
+    return _bucket_labels(int(first), buckets, granularity), result, granularity